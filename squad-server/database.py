@@ -6,6 +6,10 @@ SQLite persistence for all squad data.
 import sqlite3
 import json
 import os
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+from functools import wraps
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
 from models import (
@@ -13,10 +17,16 @@ from models import (
     Squad, EnrollmentKey, Session, InviteCode, MemberRole, SecurityLogEntry,
     Webhook, WebhookDelivery, RateLimitEntry, SharedFile, FileVersion, User,
     hash_token, get_key_prefix, generate_enrollment_key, generate_session_token,
-    generate_invite_code, generate_squad_id, generate_file_checksum,
+    generate_invite_code, generate_squad_id, generate_file_checksum, generate_file_id,
     MAX_FILE_SIZE_BYTES, MAX_SQUAD_STORAGE_BYTES, MAX_FILES_PER_SQUAD, MAX_VERSIONS_PER_FILE
 )
 
+# Keys of the dicts returned by list_files_projection, in SELECT order
+FILE_LIST_COLUMNS = (
+    "id", "filename", "path", "full_path", "mime_type", "current_version",
+    "size_bytes", "updated_at", "uploaded_by_name", "description",
+)
+
 
 class SquadDatabase:
     def __init__(self, db_path: str = "squad.db", auth_required: bool = True):
@@ -24,9 +34,74 @@ class SquadDatabase:
         self.auth_required = auth_required
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
+        # Held for every method call and for whole transaction() blocks, so
+        # the orchestrator's worker thread and the event loop take turns
+        self._lock = threading.RLock()
+        self._in_transaction = False
+        self._active_member_counts: dict[str, int] = {}  # squad_id -> active members
+        self._rosters: dict[str, tuple] = {}  # squad_id -> ({name: member}, {id: member}), active only
+        self._latest_message_ts: dict[str, str] = {}  # squad_id -> newest message timestamp
+        self._member_roles: dict[tuple, Optional[MemberRole]] = {}  # (squad_id, member_id) -> role
+        self._data_version: Optional[int] = None  # PRAGMA data_version the caches were filled at
         self._create_tables()
         self._run_migrations()
 
+    @contextmanager
+    def transaction(self):
+        """
+        Group several writes into a single BEGIN IMMEDIATE ... COMMIT.
+        Helpers called inside the block skip their own commit; nested blocks
+        join the outer transaction. Other threads wait for the block to end.
+        """
+        with self._lock:
+            if self._in_transaction:
+                yield
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._in_transaction = True
+            self.revalidate_caches()
+            try:
+                yield
+            except BaseException:
+                self.conn.rollback()
+                # Cached counts, rosters, timestamps and roles may include rolled-back writes
+                self._clear_caches()
+                raise
+            else:
+                self.conn.commit()
+            finally:
+                self._in_transaction = False
+
+    @property
+    def in_transaction(self) -> bool:
+        """True inside a transaction() block."""
+        return self._in_transaction
+
+    def _clear_caches(self):
+        """Drop every per-squad cache."""
+        self._active_member_counts.clear()
+        self._rosters.clear()
+        self._latest_message_ts.clear()
+        self._member_roles.clear()
+
+    def revalidate_caches(self):
+        """
+        Drop the per-squad caches if another connection has committed since
+        they were filled, e.g. the MCP stdio server writing to the same file.
+        PRAGMA data_version only changes for other connections' commits.
+        Called once per request, WebSocket action, tool call and
+        transaction, not on every cached lookup.
+        """
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._clear_caches()
+
+    def _commit(self):
+        """Commit now, unless a transaction() block will commit for us."""
+        if not self._in_transaction:
+            self.conn.commit()
+
     def _create_tables(self):
         cursor = self.conn.cursor()
         cursor.executescript("""
@@ -106,7 +181,10 @@ class SquadDatabase:
                 fingerprint_mode TEXT DEFAULT 'single_session',
                 created_at TEXT NOT NULL,
                 created_by TEXT NOT NULL,
-                is_active INTEGER DEFAULT 1
+                is_active INTEGER DEFAULT 1,
+                file_count INTEGER DEFAULT 0,
+                total_storage_bytes INTEGER DEFAULT 0,
+                context_summary TEXT DEFAULT ''
             );
 
             CREATE TABLE IF NOT EXISTS enrollment_keys (
@@ -214,7 +292,7 @@ class SquadDatabase:
             -- Indexes for original tables
             CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
             CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_id);
-            CREATE INDEX IF NOT EXISTS idx_messages_squad ON messages(squad_id);
+            CREATE INDEX IF NOT EXISTS idx_messages_squad_ts ON messages(squad_id, timestamp);
             CREATE INDEX IF NOT EXISTS idx_context_version ON context_entries(version);
             CREATE INDEX IF NOT EXISTS idx_context_squad ON context_entries(squad_id);
             CREATE INDEX IF NOT EXISTS idx_commits_status ON commit_proposals(status);
@@ -235,6 +313,7 @@ class SquadDatabase:
             CREATE INDEX IF NOT EXISTS idx_invite_codes_squad ON invite_codes(squad_id);
             CREATE INDEX IF NOT EXISTS idx_invite_codes_code ON invite_codes(code);
             CREATE INDEX IF NOT EXISTS idx_member_roles_squad ON member_roles(squad_id);
+            CREATE INDEX IF NOT EXISTS idx_member_roles_admins ON member_roles(squad_id, member_id) WHERE role = 'admin';
             CREATE INDEX IF NOT EXISTS idx_webhooks_squad ON webhooks(squad_id);
             CREATE INDEX IF NOT EXISTS idx_webhook_deliveries_status ON webhook_deliveries(status);
 
@@ -316,6 +395,63 @@ class SquadDatabase:
             except Exception:
                 pass  # Column might already exist
 
+        # Per-squad file counters, kept in step with shared_files by triggers
+        squad_columns = [row[1] for row in cursor.execute("PRAGMA table_info(squads)").fetchall()]
+        if "file_count" not in squad_columns:
+            cursor.execute("ALTER TABLE squads ADD COLUMN file_count INTEGER DEFAULT 0")
+            cursor.execute("ALTER TABLE squads ADD COLUMN total_storage_bytes INTEGER DEFAULT 0")
+            cursor.execute("""
+                UPDATE squads SET
+                    file_count = (SELECT COUNT(*) FROM shared_files
+                                  WHERE shared_files.squad_id = squads.id AND is_deleted = 0),
+                    total_storage_bytes = (SELECT COALESCE(SUM(size_bytes), 0) FROM shared_files
+                                           WHERE shared_files.squad_id = squads.id AND is_deleted = 0)
+            """)
+            self.conn.commit()
+        cursor.executescript("""
+            CREATE TRIGGER IF NOT EXISTS trg_shared_files_insert AFTER INSERT ON shared_files
+            WHEN NEW.is_deleted = 0
+            BEGIN
+                UPDATE squads SET file_count = file_count + 1,
+                                  total_storage_bytes = total_storage_bytes + NEW.size_bytes
+                WHERE id = NEW.squad_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_shared_files_update AFTER UPDATE OF size_bytes, is_deleted ON shared_files
+            BEGIN
+                UPDATE squads SET
+                    file_count = file_count - (OLD.is_deleted = 0) + (NEW.is_deleted = 0),
+                    total_storage_bytes = total_storage_bytes
+                        - CASE WHEN OLD.is_deleted = 0 THEN OLD.size_bytes ELSE 0 END
+                        + CASE WHEN NEW.is_deleted = 0 THEN NEW.size_bytes ELSE 0 END
+                WHERE id = NEW.squad_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_shared_files_delete AFTER DELETE ON shared_files
+            WHEN OLD.is_deleted = 0
+            BEGIN
+                UPDATE squads SET file_count = file_count - 1,
+                                  total_storage_bytes = total_storage_bytes - OLD.size_bytes
+                WHERE id = OLD.squad_id;
+            END;
+        """)
+        self.conn.commit()
+
+        # Superseded by the (squad_id, timestamp) index used for keyset reads
+        cursor.execute("DROP INDEX IF EXISTS idx_messages_squad")
+
+        # Rendered context summary, appended to by add_context_entry
+        if "context_summary" not in squad_columns:
+            cursor.execute("ALTER TABLE squads ADD COLUMN context_summary TEXT DEFAULT ''")
+            cursor.execute("""
+                UPDATE squads SET context_summary = COALESCE(
+                    (SELECT group_concat(line, char(10)) FROM (
+                        SELECT '[v' || version || '] ' || content AS line FROM context_entries
+                        WHERE context_entries.squad_id = squads.id ORDER BY version
+                    )), '')
+            """)
+            self.conn.commit()
+
         # Ensure default squad exists
         self._ensure_default_squad()
 
@@ -345,7 +481,7 @@ class SquadDatabase:
             (squad.id, squad.name, squad.consensus_mode, squad.session_ttl_hours,
              squad.fingerprint_mode, squad.created_at, squad.created_by, 1)
         )
-        self.conn.commit()
+        self._commit()
         return squad
 
     def get_squad(self, squad_id: str) -> Optional[Squad]:
@@ -371,7 +507,7 @@ class SquadDatabase:
         values = list(updates.values()) + [squad_id]
         cursor = self.conn.cursor()
         cursor.execute(f"UPDATE squads SET {set_clause} WHERE id = ?", values)
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def list_squads(self, active_only: bool = True) -> List[Squad]:
@@ -418,7 +554,7 @@ class SquadDatabase:
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (enrollment_key.id, squad_id, member_id, key_hash, key_prefix, enrollment_key.created_at, expires_at, 0)
         )
-        self.conn.commit()
+        self._commit()
         return enrollment_key, raw_key
 
     def validate_enrollment_key(self, raw_key: str) -> Optional[EnrollmentKey]:
@@ -452,7 +588,7 @@ class SquadDatabase:
             "UPDATE enrollment_keys SET is_revoked = 1, revoked_by = ? WHERE id = ?",
             (revoked_by, key_id)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def revoke_enrollment_key_by_prefix(self, key_prefix: str, revoked_by: str) -> bool:
@@ -462,7 +598,7 @@ class SquadDatabase:
             "UPDATE enrollment_keys SET is_revoked = 1, revoked_by = ? WHERE key_prefix = ?",
             (revoked_by, key_prefix)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def get_enrollment_keys_for_member(self, squad_id: str, member_id: str) -> List[EnrollmentKey]:
@@ -512,7 +648,7 @@ class SquadDatabase:
             (session.id, session.squad_id, session.member_id, session.enrollment_key_id,
              token_hash, ip_address, user_agent, session.created_at, expires_at, 1)
         )
-        self.conn.commit()
+        self._commit()
         return session, raw_token
 
     def validate_session(self, raw_token: str) -> Optional[Session]:
@@ -543,7 +679,7 @@ class SquadDatabase:
         """Terminate a session."""
         cursor = self.conn.cursor()
         cursor.execute("UPDATE sessions SET is_active = 0 WHERE id = ?", (session_id,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def terminate_sessions_for_member(self, squad_id: str, member_id: str) -> int:
@@ -553,7 +689,7 @@ class SquadDatabase:
             "UPDATE sessions SET is_active = 0 WHERE squad_id = ? AND member_id = ? AND is_active = 1",
             (squad_id, member_id)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount
 
     def get_active_sessions(self, squad_id: str) -> List[Session]:
@@ -580,7 +716,7 @@ class SquadDatabase:
         now = datetime.now(timezone.utc).isoformat()
         cursor = self.conn.cursor()
         cursor.execute("UPDATE sessions SET is_active = 0 WHERE expires_at < ? AND is_active = 1", (now,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount
 
     # ══════════════════════════════════════════════════════════════════════
@@ -596,7 +732,7 @@ class SquadDatabase:
             (user.id, user.email, user.name, user.picture, user.auth_provider,
              user.google_id, user.created_at, user.last_login, 1 if user.is_active else 0)
         )
-        self.conn.commit()
+        self._commit()
         return user
 
     def get_user(self, user_id: str) -> Optional[User]:
@@ -648,7 +784,7 @@ class SquadDatabase:
         values = list(updates.values()) + [user_id]
         cursor = self.conn.cursor()
         cursor.execute(f"UPDATE users SET {set_clause} WHERE id = ?", values)
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def update_user_last_login(self, user_id: str) -> bool:
@@ -656,7 +792,7 @@ class SquadDatabase:
         now = datetime.now(timezone.utc).isoformat()
         cursor = self.conn.cursor()
         cursor.execute("UPDATE users SET last_login = ? WHERE id = ?", (now, user_id))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def create_session_for_user(self, user: User, squad_id: str, member_id: str,
@@ -686,7 +822,7 @@ class SquadDatabase:
             (session.id, session.squad_id, session.member_id, session.enrollment_key_id,
              token_hash, ip_address, user_agent, session.created_at, expires_at, 1)
         )
-        self.conn.commit()
+        self._commit()
         return session, raw_token
 
     def get_member_by_user_id(self, user_id: str, squad_id: str) -> Optional[SquadMember]:
@@ -755,7 +891,7 @@ class SquadDatabase:
             (invite.id, squad_id, code, code_hash, created_by, invite.created_at,
              expires_at, max_uses, 0, target_name, 0)
         )
-        self.conn.commit()
+        self._commit()
         return invite
 
     def validate_invite_code(self, code: str) -> Optional[InviteCode]:
@@ -790,7 +926,7 @@ class SquadDatabase:
         """Increment the times_used for an invite."""
         cursor = self.conn.cursor()
         cursor.execute("UPDATE invite_codes SET times_used = times_used + 1 WHERE id = ?", (invite_id,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def revoke_invite_code(self, squad_id: str, code: str) -> bool:
@@ -800,7 +936,7 @@ class SquadDatabase:
             "UPDATE invite_codes SET is_revoked = 1 WHERE squad_id = ? AND code = ?",
             (squad_id, code)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def get_invite_codes(self, squad_id: str, include_revoked: bool = False) -> List[InviteCode]:
@@ -851,27 +987,45 @@ class SquadDatabase:
             )
             role_id = role_obj.id
 
-        self.conn.commit()
-        return MemberRole(id=role_id, squad_id=squad_id, member_id=member_id, role=role, granted_at=now, granted_by=granted_by)
+        self._commit()
+        member_role = MemberRole(id=role_id, squad_id=squad_id, member_id=member_id, role=role, granted_at=now, granted_by=granted_by)
+        self._member_roles[(squad_id, member_id)] = member_role
+        return member_role
 
     def get_member_role(self, squad_id: str, member_id: str) -> Optional[MemberRole]:
-        """Get a member's role in a squad."""
+        """
+        Get a member's role in a squad. Every authenticated request asks, so
+        lookups are cached; set_member_role() updates the cache, and another
+        connection's writes drop it at the next revalidate_caches(). Callers
+        get a copy of the cached role.
+        """
+        key = (squad_id, member_id)
+        if key in self._member_roles:
+            member_role = self._member_roles[key]
+            return replace(member_role) if member_role else None
         cursor = self.conn.cursor()
         row = cursor.execute(
             "SELECT * FROM member_roles WHERE squad_id = ? AND member_id = ?",
             (squad_id, member_id)
         ).fetchone()
+        member_role = None
         if row:
-            return MemberRole(
+            member_role = MemberRole(
                 id=row["id"], squad_id=row["squad_id"], member_id=row["member_id"],
                 role=row["role"], granted_at=row["granted_at"], granted_by=row["granted_by"]
             )
-        return None
+        self._member_roles[key] = member_role
+        return replace(member_role) if member_role else None
 
     def is_admin(self, squad_id: str, member_id: str) -> bool:
         """Check if a member is an admin."""
-        role = self.get_member_role(squad_id, member_id)
-        return role is not None and role.role == "admin"
+        # Answered straight from the partial admin index, no row fetch
+        cursor = self.conn.cursor()
+        row = cursor.execute(
+            "SELECT 1 FROM member_roles WHERE squad_id = ? AND member_id = ? AND role = 'admin' LIMIT 1",
+            (squad_id, member_id)
+        ).fetchone()
+        return row is not None
 
     # ══════════════════════════════════════════════════════════════════════
     # SECURITY LOG OPERATIONS
@@ -895,9 +1049,39 @@ class SquadDatabase:
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (entry.id, squad_id, event_type, member_id, entry.details, ip_address, user_agent, entry.timestamp)
         )
-        self.conn.commit()
+        self._commit()
         return entry
 
+    def log_security_events(self, events: List[tuple]) -> int:
+        """
+        Insert a batch of security events with one executemany.
+        Each item is (event_type, squad_id, member_id, details, ip_address,
+        user_agent, timestamp), in log_security_event's argument order.
+        """
+        rows = []
+        for event_type, squad_id, member_id, details, ip_address, user_agent, timestamp in events:
+            entry = SecurityLogEntry(
+                squad_id=squad_id,
+                event_type=event_type,
+                member_id=member_id,
+                details=json.dumps(details) if details else None,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                timestamp=timestamp
+            )
+            rows.append((entry.id, squad_id, event_type, member_id, entry.details,
+                         ip_address, user_agent, entry.timestamp))
+        if not rows:
+            return 0
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "INSERT INTO security_log (id, squad_id, event_type, member_id, details, ip_address, user_agent, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self._commit()
+        return len(rows)
+
     def get_security_log(self, squad_id: str, limit: int = 50, event_types: Optional[List[str]] = None) -> List[SecurityLogEntry]:
         """Get security log entries for a squad."""
         cursor = self.conn.cursor()
@@ -939,21 +1123,21 @@ class SquadDatabase:
                     "UPDATE rate_limits SET count = 1, window_start = ? WHERE key = ?",
                     (now.isoformat(), key)
                 )
-                self.conn.commit()
+                self._commit()
                 return True, limit - 1
             else:
                 count = row["count"]
                 if count >= limit:
                     return False, 0
                 cursor.execute("UPDATE rate_limits SET count = count + 1 WHERE key = ?", (key,))
-                self.conn.commit()
+                self._commit()
                 return True, limit - count - 1
         else:
             cursor.execute(
                 "INSERT INTO rate_limits (key, count, window_start) VALUES (?, 1, ?)",
                 (key, now.isoformat())
             )
-            self.conn.commit()
+            self._commit()
             return True, limit - 1
 
     def cleanup_rate_limits(self, older_than_seconds: int = 3600) -> int:
@@ -961,7 +1145,7 @@ class SquadDatabase:
         cutoff = (datetime.now(timezone.utc) - timedelta(seconds=older_than_seconds)).isoformat()
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM rate_limits WHERE window_start < ?", (cutoff,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount
 
     # ══════════════════════════════════════════════════════════════════════
@@ -983,7 +1167,7 @@ class SquadDatabase:
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (webhook.id, squad_id, url, webhook.secret_hash, webhook.event_types, created_by, webhook.created_at, 1, 0)
         )
-        self.conn.commit()
+        self._commit()
         return webhook
 
     def get_webhooks(self, squad_id: str, active_only: bool = True) -> List[Webhook]:
@@ -1022,7 +1206,7 @@ class SquadDatabase:
         """Delete a webhook."""
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM webhooks WHERE id = ?", (webhook_id,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def update_webhook_failure(self, webhook_id: str, increment: bool = True) -> bool:
@@ -1041,24 +1225,31 @@ class SquadDatabase:
             )
         else:
             cursor.execute("UPDATE webhooks SET failure_count = 0 WHERE id = ?", (webhook_id,))
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def create_webhook_delivery(self, webhook_id: str, event_type: str, payload: dict) -> WebhookDelivery:
         """Create a webhook delivery record."""
-        delivery = WebhookDelivery(
-            webhook_id=webhook_id,
-            event_type=event_type,
-            payload=json.dumps(payload)
-        )
+        return self.create_webhook_deliveries([webhook_id], event_type, json.dumps(payload))[0]
+
+    def create_webhook_deliveries(self, webhook_ids: List[str], event_type: str,
+                                  payload_json: str) -> List[WebhookDelivery]:
+        """
+        Create one pending delivery of the same serialized payload per
+        webhook, with all rows inserted in a single commit.
+        """
+        deliveries = [
+            WebhookDelivery(webhook_id=webhook_id, event_type=event_type, payload=payload_json)
+            for webhook_id in webhook_ids
+        ]
         cursor = self.conn.cursor()
-        cursor.execute(
+        cursor.executemany(
             "INSERT INTO webhook_deliveries (id, webhook_id, event_type, payload, attempt_count, status, created_at) "
             "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (delivery.id, webhook_id, event_type, delivery.payload, 0, "pending", delivery.created_at)
+            [(d.id, d.webhook_id, event_type, payload_json, 0, "pending", d.created_at) for d in deliveries]
         )
-        self.conn.commit()
-        return delivery
+        self._commit()
+        return deliveries
 
     def update_webhook_delivery(self, delivery_id: str, status: str, response_code: Optional[int] = None,
                                  response_body: Optional[str] = None) -> bool:
@@ -1070,7 +1261,7 @@ class SquadDatabase:
             "attempt_count = attempt_count + 1, delivered_at = ? WHERE id = ?",
             (status, response_code, response_body, now if status == "success" else None, delivery_id)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def get_pending_deliveries(self, limit: int = 100) -> List[WebhookDelivery]:
@@ -1091,6 +1282,29 @@ class SquadDatabase:
             for r in rows
         ]
 
+    def get_pending_delivery_schedule(self) -> List[tuple]:
+        """(id, attempt_count, created_at) of every pending delivery, without payloads."""
+        cursor = self.conn.cursor()
+        return [
+            tuple(r) for r in cursor.execute(
+                "SELECT id, attempt_count, created_at FROM webhook_deliveries WHERE status = 'pending'"
+            ).fetchall()
+        ]
+
+    def get_webhook_delivery(self, delivery_id: str) -> Optional[WebhookDelivery]:
+        """Get a webhook delivery by ID."""
+        cursor = self.conn.cursor()
+        r = cursor.execute("SELECT * FROM webhook_deliveries WHERE id = ?", (delivery_id,)).fetchone()
+        if r:
+            return WebhookDelivery(
+                id=r["id"], webhook_id=r["webhook_id"], event_type=r["event_type"],
+                payload=r["payload"], attempt_count=r["attempt_count"],
+                status=r["status"], response_code=r["response_code"],
+                response_body=r["response_body"], created_at=r["created_at"],
+                delivered_at=r["delivered_at"]
+            )
+        return None
+
     # ══════════════════════════════════════════════════════════════════════
     # MEMBER OPERATIONS (updated for squad_id)
     # ══════════════════════════════════════════════════════════════════════
@@ -1103,15 +1317,39 @@ class SquadDatabase:
             "INSERT OR REPLACE INTO members (id, name, model, joined_at, is_active, squad_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
             (member.id, member.name, member.model, member.joined_at, 1, squad_id, member.user_id)
         )
-        self.conn.commit()
+        self._commit()
+        self._active_member_counts.pop(squad_id, None)
+        self._rosters.pop(squad_id, None)
         return member
 
     def remove_member(self, member_id: str, squad_id: str = "default"):
         cursor = self.conn.cursor()
         cursor.execute("UPDATE members SET is_active = 0 WHERE id = ? AND squad_id = ?", (member_id, squad_id))
-        self.conn.commit()
+        self._commit()
+        self._active_member_counts.pop(squad_id, None)
+        self._rosters.pop(squad_id, None)
+
+    def _roster(self, squad_id: str) -> tuple:
+        """
+        ({name: member}, {id: member}) for the squad's active members, loaded
+        on first use and dropped on every add/remove, here or (at the next
+        revalidate_caches()) by another connection. The members are shared;
+        the getters below hand out copies.
+        """
+        roster = self._rosters.get(squad_id)
+        if roster is None:
+            by_name, by_id = {}, {}
+            for m in self.get_active_members(squad_id):
+                by_name.setdefault(m.name, m)  # first match, as the old SELECT returned
+                by_id[m.id] = m
+            roster = self._rosters[squad_id] = (by_name, by_id)
+        return roster
 
     def get_member(self, member_id: str, squad_id: str = "default") -> Optional[SquadMember]:
+        # Active members come from the roster; inactive ones still need the row
+        member = self._roster(squad_id)[1].get(member_id)
+        if member:
+            return replace(member)
         cursor = self.conn.cursor()
         row = cursor.execute("SELECT * FROM members WHERE id = ? AND squad_id = ?", (member_id, squad_id)).fetchone()
         if row:
@@ -1123,17 +1361,9 @@ class SquadDatabase:
         return None
 
     def get_member_by_name(self, name: str, squad_id: str = "default") -> Optional[SquadMember]:
-        cursor = self.conn.cursor()
-        row = cursor.execute(
-            "SELECT * FROM members WHERE name = ? AND squad_id = ? AND is_active = 1", (name, squad_id)
-        ).fetchone()
-        if row:
-            return SquadMember(
-                id=row["id"], name=row["name"], model=row["model"],
-                joined_at=row["joined_at"], is_active=bool(row["is_active"]),
-                user_id=row["user_id"] if "user_id" in row.keys() else None
-            )
-        return None
+        """Look up an active member by name, from the squad's cached roster."""
+        member = self._roster(squad_id)[0].get(name)
+        return replace(member) if member else None
 
     def get_active_members(self, squad_id: str = "default") -> List[SquadMember]:
         cursor = self.conn.cursor()
@@ -1147,19 +1377,55 @@ class SquadDatabase:
             for r in rows
         ]
 
+    def get_active_member_count(self, squad_id: str = "default") -> int:
+        """Number of active members, cached until the next add/remove here or elsewhere."""
+        count = self._active_member_counts.get(squad_id)
+        if count is None:
+            cursor = self.conn.cursor()
+            count = cursor.execute(
+                "SELECT COUNT(*) FROM members WHERE is_active = 1 AND squad_id = ?", (squad_id,)
+            ).fetchone()[0]
+            self._active_member_counts[squad_id] = count
+        return count
+
     # ── Messages ─────────────────────────────────────────────────────────
 
     def add_message(self, message: Message, squad_id: str = "default") -> Message:
+        self.add_message_dict(message.to_dict(), squad_id)
+        return message
+
+    def add_message_dict(self, message: dict, squad_id: str = "default") -> dict:
+        """Insert a message given in Message.to_dict() form."""
         cursor = self.conn.cursor()
         cursor.execute(
             "INSERT INTO messages (id, sender_id, sender_name, sender_type, content, timestamp, reply_to, squad_id) "
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (message.id, message.sender_id, message.sender_name,
-             message.sender_type, message.content, message.timestamp, message.reply_to, squad_id)
+            (message["id"], message["sender_id"], message["sender_name"],
+             message["sender_type"], message["content"], message["timestamp"], message["reply_to"], squad_id)
         )
-        self.conn.commit()
+        self._commit()
+        self._note_message_ts(squad_id, message["timestamp"])
         return message
 
+    def _note_message_ts(self, squad_id: str, timestamp: str):
+        latest = self._latest_message_ts.get(squad_id)
+        if latest is not None and timestamp > latest:
+            self._latest_message_ts[squad_id] = timestamp
+
+    def latest_message_timestamp(self, squad_id: str = "default") -> str:
+        """
+        Newest message timestamp in the squad ("" if none), cached after the
+        first read until another connection writes.
+        """
+        latest = self._latest_message_ts.get(squad_id)
+        if latest is None:
+            cursor = self.conn.cursor()
+            latest = cursor.execute(
+                "SELECT MAX(timestamp) FROM messages WHERE squad_id = ?", (squad_id,)
+            ).fetchone()[0] or ""
+            self._latest_message_ts[squad_id] = latest
+        return latest
+
     def get_messages(self, since: Optional[str] = None, limit: int = 100, squad_id: str = "default") -> List[Message]:
         cursor = self.conn.cursor()
         if since:
@@ -1184,17 +1450,31 @@ class SquadDatabase:
     # ── Context ──────────────────────────────────────────────────────────
 
     def add_context_entry(self, entry: ContextEntry, squad_id: str = "default") -> ContextEntry:
+        entry.version = self.add_context_entry_dict(entry.to_dict(), squad_id)["version"]
+        return entry
+
+    def add_context_entry_dict(self, entry: dict, squad_id: str = "default") -> dict:
+        """
+        Insert a context entry given in ContextEntry.to_dict() form. Sets and
+        returns it with the next version for the squad.
+        """
         # Auto-increment version per squad
         cursor = self.conn.cursor()
         row = cursor.execute("SELECT MAX(version) as max_v FROM context_entries WHERE squad_id = ?", (squad_id,)).fetchone()
-        entry.version = (row["max_v"] or 0) + 1
+        entry["version"] = version = (row["max_v"] or 0) + 1
         cursor.execute(
             "INSERT INTO context_entries (id, content, committed_at, committed_by, origin, commit_id, version, squad_id) "
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (entry.id, entry.content, entry.committed_at, entry.committed_by,
-             entry.origin, entry.commit_id, entry.version, squad_id)
+            (entry["id"], entry["content"], entry["committed_at"], entry["committed_by"],
+             entry["origin"], entry["commit_id"], version, squad_id)
         )
-        self.conn.commit()
+        line = f"[v{version}] {entry['content']}"
+        cursor.execute(
+            "UPDATE squads SET context_summary = CASE WHEN COALESCE(context_summary, '') = '' THEN ? "
+            "ELSE context_summary || char(10) || ? END WHERE id = ?",
+            (line, line, squad_id)
+        )
+        self._commit()
         return entry
 
     def get_context(self, squad_id: str = "default") -> List[ContextEntry]:
@@ -1211,6 +1491,19 @@ class SquadDatabase:
             for r in rows
         ]
 
+    def get_context_summary(self, squad_id: str = "default") -> Optional[tuple]:
+        """
+        Return (version, summary) in one query, or None if the squad has no row.
+        """
+        cursor = self.conn.cursor()
+        row = cursor.execute(
+            "SELECT (SELECT MAX(version) FROM context_entries WHERE squad_id = squads.id) AS max_v, "
+            "context_summary FROM squads WHERE id = ?", (squad_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return row["max_v"] or 0, row["context_summary"] or ""
+
     def get_context_version(self, squad_id: str = "default") -> int:
         cursor = self.conn.cursor()
         row = cursor.execute("SELECT MAX(version) as max_v FROM context_entries WHERE squad_id = ?", (squad_id,)).fetchone()
@@ -1228,7 +1521,7 @@ class SquadDatabase:
              commit.origin, commit.status, commit.created_at, commit.resolved_at,
              commit.consensus_mode, commit.timeout_seconds, squad_id)
         )
-        self.conn.commit()
+        self._commit()
         return commit
 
     def get_pending_commits(self, squad_id: str = "default") -> List[CommitProposal]:
@@ -1248,13 +1541,70 @@ class SquadDatabase:
             for r in rows
         ]
 
-    def update_commit_status(self, commit_id: str, status: str, resolved_at: str):
+    def count_pending_commits(self, squad_id: str = "default") -> int:
         cursor = self.conn.cursor()
-        cursor.execute(
-            "UPDATE commit_proposals SET status = ?, resolved_at = ? WHERE id = ?",
-            (status, resolved_at, commit_id)
-        )
-        self.conn.commit()
+        return cursor.execute(
+            "SELECT COUNT(*) FROM commit_proposals WHERE status = 'pending' AND squad_id = ?", (squad_id,)
+        ).fetchone()[0]
+
+    def get_pending_commits_with_votes(self, squad_id: str = "default") -> List[tuple]:
+        """
+        Load pending commits and their votes with one LEFT JOIN.
+        Returns [(CommitProposal, [Vote, ...])] ordered by creation time.
+        """
+        cursor = self.conn.cursor()
+        rows = cursor.execute(
+            "SELECT c.*, v.id AS vote_id, v.voter_id, v.voter_name, v.choice, "
+            "v.is_human_override, v.voted_at "
+            "FROM commit_proposals c LEFT JOIN votes v ON v.commit_id = c.id "
+            "WHERE c.status = 'pending' AND c.squad_id = ? "
+            "ORDER BY c.created_at ASC, c.id, v.rowid",
+            (squad_id,)
+        ).fetchall()
+        result = []
+        current = None
+        for r in rows:
+            if current is None or current[0].id != r["id"]:
+                current = (
+                    CommitProposal(
+                        id=r["id"], content=r["content"], proposed_by=r["proposed_by"],
+                        proposed_by_name=r["proposed_by_name"], origin=r["origin"],
+                        status=r["status"], created_at=r["created_at"],
+                        resolved_at=r["resolved_at"], consensus_mode=r["consensus_mode"],
+                        timeout_seconds=r["timeout_seconds"]
+                    ),
+                    []
+                )
+                result.append(current)
+            if r["vote_id"] is not None:
+                current[1].append(Vote(
+                    id=r["vote_id"], commit_id=r["id"], voter_id=r["voter_id"],
+                    voter_name=r["voter_name"], choice=r["choice"],
+                    is_human_override=bool(r["is_human_override"]),
+                    voted_at=r["voted_at"]
+                ))
+        return result
+
+    def update_commit_status(self, commit_id: str, status: str, resolved_at: str,
+                             expected_status: Optional[str] = None) -> bool:
+        """
+        Set a commit's status. With expected_status, only update if the
+        commit is still in that status (compare-and-set); returns whether
+        a row changed.
+        """
+        cursor = self.conn.cursor()
+        if expected_status is None:
+            cursor.execute(
+                "UPDATE commit_proposals SET status = ?, resolved_at = ? WHERE id = ?",
+                (status, resolved_at, commit_id)
+            )
+        else:
+            cursor.execute(
+                "UPDATE commit_proposals SET status = ?, resolved_at = ? WHERE id = ? AND status = ?",
+                (status, resolved_at, commit_id, expected_status)
+            )
+        self._commit()
+        return cursor.rowcount > 0
 
     def get_commit(self, commit_id: str) -> Optional[CommitProposal]:
         cursor = self.conn.cursor()
@@ -1274,15 +1624,20 @@ class SquadDatabase:
     # ── Votes ────────────────────────────────────────────────────────────
 
     def add_vote(self, vote: Vote, squad_id: str = "default") -> Vote:
+        self.add_vote_dict(vote.to_dict(), squad_id)
+        return vote
+
+    def add_vote_dict(self, vote: dict, squad_id: str = "default") -> dict:
+        """Insert a vote given in Vote.to_dict() form."""
         cursor = self.conn.cursor()
         cursor.execute(
             "INSERT OR REPLACE INTO votes "
             "(id, commit_id, voter_id, voter_name, choice, is_human_override, voted_at, squad_id) "
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (vote.id, vote.commit_id, vote.voter_id, vote.voter_name,
-             vote.choice, int(vote.is_human_override), vote.voted_at, squad_id)
+            (vote["id"], vote["commit_id"], vote["voter_id"], vote["voter_name"],
+             vote["choice"], int(vote["is_human_override"]), vote["voted_at"], squad_id)
         )
-        self.conn.commit()
+        self._commit()
         return vote
 
     def get_votes_for_commit(self, commit_id: str) -> List[Vote]:
@@ -1300,6 +1655,27 @@ class SquadDatabase:
             for r in rows
         ]
 
+    def get_vote_tally(self, commit_id: str) -> dict:
+        """
+        Count a commit's votes in SQL.
+        Returns {"approve": n, "reject": n, "abstain": n, "total": n,
+        "human_rejections": [voter names]}.
+        """
+        cursor = self.conn.cursor()
+        rows = cursor.execute(
+            "SELECT choice, COUNT(*), "
+            "GROUP_CONCAT(CASE WHEN is_human_override = 1 THEN voter_name END, char(31)) "
+            "FROM votes WHERE commit_id = ? GROUP BY choice",
+            (commit_id,)
+        ).fetchall()
+        tally = {"approve": 0, "reject": 0, "abstain": 0, "total": 0, "human_rejections": []}
+        for choice, count, overriders in rows:
+            tally[choice] = count
+            tally["total"] += count
+            if choice == "reject" and overriders:
+                tally["human_rejections"] = overriders.split("\x1f")
+        return tally
+
     # ══════════════════════════════════════════════════════════════════════
     # SHARED FILES OPERATIONS
     # ══════════════════════════════════════════════════════════════════════
@@ -1308,17 +1684,13 @@ class SquadDatabase:
         """Get storage statistics for a squad."""
         cursor = self.conn.cursor()
 
-        # Total files (not deleted)
-        file_count = cursor.execute(
-            "SELECT COUNT(*) as cnt FROM shared_files WHERE squad_id = ? AND is_deleted = 0",
-            (squad_id,)
-        ).fetchone()["cnt"]
-
-        # Total storage used (sum of current version sizes)
-        storage_used = cursor.execute(
-            "SELECT COALESCE(SUM(size_bytes), 0) as total FROM shared_files WHERE squad_id = ? AND is_deleted = 0",
+        # Counters are maintained by the shared_files triggers
+        row = cursor.execute(
+            "SELECT file_count, total_storage_bytes FROM squads WHERE id = ?",
             (squad_id,)
-        ).fetchone()["total"]
+        ).fetchone()
+        file_count = (row["file_count"] or 0) if row else 0
+        storage_used = (row["total_storage_bytes"] or 0) if row else 0
 
         return {
             "file_count": file_count,
@@ -1353,11 +1725,16 @@ class SquadDatabase:
 
     def create_file(self, squad_id: str, filename: str, path: str, mime_type: str,
                     size_bytes: int, uploaded_by: str, uploaded_by_name: str,
-                    storage_key: str, checksum: str, description: str = None) -> tuple[SharedFile, FileVersion]:
-        """Create a new shared file with initial version."""
+                    storage_key: str, checksum: str, description: str = None,
+                    file_id: Optional[str] = None) -> tuple[SharedFile, FileVersion]:
+        """
+        Create a new shared file with initial version.
+        Pass file_id when content was already stored under that ID.
+        """
         now = datetime.now(timezone.utc).isoformat()
 
         file = SharedFile(
+            id=file_id or generate_file_id(),
             squad_id=squad_id,
             filename=filename,
             path=path,
@@ -1396,7 +1773,7 @@ class SquadDatabase:
             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (version.id, file.id, 1, size_bytes, uploaded_by, uploaded_by_name, now, None, storage_key, checksum)
         )
-        self.conn.commit()
+        self._commit()
         return file, version
 
     def add_file_version(self, file_id: str, size_bytes: int, uploaded_by: str,
@@ -1415,10 +1792,6 @@ class SquadDatabase:
 
         new_version = row["current_version"] + 1
 
-        # Check version limit
-        if new_version > MAX_VERSIONS_PER_FILE:
-            return None
-
         now = datetime.now(timezone.utc).isoformat()
 
         version = FileVersion(
@@ -1433,18 +1806,24 @@ class SquadDatabase:
             checksum=checksum
         )
 
+        # The version limit (and a concurrent upload bumping current_version
+        # first) is enforced by the INSERT itself; no rows means rejected.
         cursor.execute(
             "INSERT INTO file_versions (id, file_id, version, size_bytes, uploaded_by, "
             "uploaded_by_name, uploaded_at, change_note, storage_key, checksum) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (version.id, file_id, new_version, size_bytes, uploaded_by, uploaded_by_name,
-             now, change_note, storage_key, checksum)
+            "SELECT ?, id, ?, ?, ?, ?, ?, ?, ?, ? FROM shared_files "
+            "WHERE id = ? AND current_version = ? AND current_version < ?",
+            (version.id, new_version, size_bytes, uploaded_by, uploaded_by_name,
+             now, change_note, storage_key, checksum,
+             file_id, new_version - 1, MAX_VERSIONS_PER_FILE)
         )
+        if cursor.rowcount == 0:
+            return None
         cursor.execute(
             "UPDATE shared_files SET current_version = ?, size_bytes = ?, updated_at = ? WHERE id = ?",
             (new_version, size_bytes, now, file_id)
         )
-        self.conn.commit()
+        self._commit()
         return version
 
     def get_file(self, squad_id: str, filename: str, path: str = "") -> Optional[SharedFile]:
@@ -1483,10 +1862,18 @@ class SquadDatabase:
             )
         return None
 
-    def list_files(self, squad_id: str, path: str = None, sort_by: str = "date") -> List[SharedFile]:
-        """List files in a squad, optionally filtered by path."""
-        cursor = self.conn.cursor()
-        query = "SELECT * FROM shared_files WHERE squad_id = ? AND is_deleted = 0"
+    def list_files_projection(self, squad_id: str, path: str = None, sort_by: str = "date") -> List[dict]:
+        """
+        List files in a squad, optionally filtered by path, selecting only the
+        columns a file listing shows, as plain dicts keyed by FILE_LIST_COLUMNS.
+        """
+        cursor = self.conn.cursor()
+        query = (
+            "SELECT id, filename, path, "
+            "CASE WHEN path != '' THEN path || filename ELSE filename END, "
+            "mime_type, current_version, size_bytes, updated_at, uploaded_by_name, description "
+            "FROM shared_files WHERE squad_id = ? AND is_deleted = 0"
+        )
         params = [squad_id]
 
         if path is not None:
@@ -1500,18 +1887,10 @@ class SquadDatabase:
         else:  # date
             query += " ORDER BY updated_at DESC"
 
+        # Plain tuples are cheaper than sqlite3.Row here
+        cursor.row_factory = None
         rows = cursor.execute(query, params).fetchall()
-        return [
-            SharedFile(
-                id=r["id"], squad_id=r["squad_id"], filename=r["filename"],
-                path=r["path"], mime_type=r["mime_type"], size_bytes=r["size_bytes"],
-                current_version=r["current_version"], uploaded_by=r["uploaded_by"],
-                uploaded_by_name=r["uploaded_by_name"], description=r["description"],
-                is_deleted=bool(r["is_deleted"]), created_at=r["created_at"],
-                updated_at=r["updated_at"]
-            )
-            for r in rows
-        ]
+        return [dict(zip(FILE_LIST_COLUMNS, row)) for row in rows]
 
     def get_file_version(self, file_id: str, version: int = None) -> Optional[FileVersion]:
         """Get a specific version of a file, or latest if version is None."""
@@ -1563,7 +1942,7 @@ class SquadDatabase:
             "UPDATE shared_files SET is_deleted = 1, updated_at = ? WHERE id = ?",
             (now, file_id)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def update_file_description(self, file_id: str, description: str) -> bool:
@@ -1574,8 +1953,25 @@ class SquadDatabase:
             "UPDATE shared_files SET description = ?, updated_at = ? WHERE id = ?",
             (description, now, file_id)
         )
-        self.conn.commit()
+        self._commit()
         return cursor.rowcount > 0
 
     def close(self):
         self.conn.close()
+
+
+def _serialized(method):
+    """Wrap a SquadDatabase method to run while holding the connection lock."""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+# The connection is shared across threads, so each call runs whole: one
+# thread's statements can't land inside another's implicit or explicit
+# transaction, and the caches change under the same lock
+for _name, _method in list(vars(SquadDatabase).items()):
+    if callable(_method) and not _name.startswith("__") and _name != "transaction":
+        setattr(SquadDatabase, _name, _serialized(_method))
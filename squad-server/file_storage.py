@@ -4,19 +4,33 @@ Handles local filesystem storage for shared files with versioning.
 """
 
 import os
-import base64
+import re
+import mmap
+import binascii
 import shutil
 import logging
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Iterable, Iterator, Optional, Tuple
+
+# pybase64 is a SIMD-accelerated drop-in for the stdlib module; use it when installed
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 from models import (
-    generate_file_checksum, is_text_mime_type,
+    file_checksum, generate_file_checksum, is_text_mime_type, new_file_hasher,
     MAX_FILE_SIZE_BYTES
 )
 
 logger = logging.getLogger(__name__)
 
+# Content is decoded/encoded and written in pieces of this many characters
+# (a multiple of 4 so base64 chunks decode independently)
+CONTENT_CHUNK_CHARS = 256 * 1024
+# Characters a lenient base64 decode skips
+_NON_BASE64_CHARS = re.compile(r"[^A-Za-z0-9+/=]")
+
 
 class FileStorageError(Exception):
     """Base exception for file storage errors."""
@@ -90,6 +104,72 @@ class FileStorage:
 
         return storage_key, checksum, size_bytes
 
+    def store_file_from_chunks(self, squad_id: str, file_id: str, version: int, filename: str,
+                               chunks: Iterable[bytes]) -> Tuple[str, str, int]:
+        """
+        Store a file from an iterable of byte chunks, hashing and writing
+        each chunk as it arrives so the whole file is never held at once.
+
+        Returns:
+            Tuple of (storage_key, checksum, size_bytes)
+
+        Raises:
+            FileStorageError: If the content is too large or storage fails
+        """
+        file_path = self._get_file_path(squad_id, file_id, version, filename)
+        hasher = new_file_hasher()
+        size_bytes = 0
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(file_path, "wb") as f:
+                for chunk in chunks:
+                    size_bytes += len(chunk)
+                    if size_bytes > MAX_FILE_SIZE_BYTES:
+                        raise FileStorageError(
+                            f"File size exceeds maximum of {MAX_FILE_SIZE_BYTES} bytes"
+                        )
+                    hasher.update(chunk)
+                    f.write(chunk)
+        except FileStorageError:
+            file_path.unlink(missing_ok=True)
+            raise
+        except OSError as e:
+            file_path.unlink(missing_ok=True)
+            raise FileStorageError(f"Failed to store file: {e}")
+
+        storage_key = self.get_storage_key(squad_id, file_id, version, filename)
+        logger.info(f"Stored file: {storage_key} ({size_bytes} bytes)")
+
+        return storage_key, file_checksum(hasher), size_bytes
+
+    @staticmethod
+    def _text_chunks(content: str) -> Iterator[bytes]:
+        """Encode text to UTF-8 a slice at a time."""
+        for i in range(0, len(content), CONTENT_CHUNK_CHARS):
+            yield content[i:i + CONTENT_CHUNK_CHARS].encode('utf-8')
+
+    @staticmethod
+    def _base64_chunks(content: str) -> Iterator[bytes]:
+        """
+        Decode base64 a slice at a time, as leniently as a one-shot
+        b64decode: characters outside the alphabet are ignored.
+        """
+        # Ignored characters (line breaks, URL-safe -/_, ...) would shift the
+        # 4-character alignment between slices; one pass drops them all, and
+        # returns the string itself when there are none
+        content = _NON_BASE64_CHARS.sub("", content)
+        end = len(content) - (2 if content.endswith("==") else 1 if content.endswith("=") else 0)
+        try:
+            if content.find("=", 0, end) != -1:
+                # Padding mid-stream ends a lenient decode early; slices can't
+                # reproduce that, so decode in one go with the stdlib's rules
+                yield binascii.a2b_base64(content)
+                return
+            for i in range(0, len(content), CONTENT_CHUNK_CHARS):
+                yield base64.b64decode(content[i:i + CONTENT_CHUNK_CHARS])
+        except (binascii.Error, ValueError) as e:
+            raise FileStorageError(f"Invalid base64 content: {e}")
+
     def store_file_from_content(self, squad_id: str, file_id: str, version: int,
                                  filename: str, content: str, mime_type: str,
                                  encoding: str = "auto") -> Tuple[str, str, int]:
@@ -114,16 +194,12 @@ class FileStorage:
         else:
             is_text = (encoding == "text")
 
-        # Convert to bytes
-        if is_text:
-            content_bytes = content.encode('utf-8')
-        else:
-            try:
-                content_bytes = base64.b64decode(content)
-            except Exception as e:
-                raise FileStorageError(f"Invalid base64 content: {e}")
+        # Reject oversized base64 up front, before decoding any of it
+        if not is_text and len(content) * 3 // 4 > MAX_FILE_SIZE_BYTES + 2:
+            raise FileStorageError(f"File size exceeds maximum of {MAX_FILE_SIZE_BYTES} bytes")
 
-        return self.store_file(squad_id, file_id, version, filename, content_bytes)
+        chunks = self._text_chunks(content) if is_text else self._base64_chunks(content)
+        return self.store_file_from_chunks(squad_id, file_id, version, filename, chunks)
 
     def read_file(self, storage_key: str) -> Optional[bytes]:
         """
@@ -144,6 +220,19 @@ class FileStorage:
             logger.error(f"Failed to read file {storage_key}: {e}")
             return None
 
+    def get_file_path(self, storage_key: str) -> Optional[Path]:
+        """Path of a stored file, for streaming it, or None if not found."""
+        file_path = self.base_path / storage_key
+        return file_path if file_path.is_file() else None
+
+    def _read_base64(self, file_path: Path) -> str:
+        """Base64-encode a file from a memory map, without copying its raw bytes."""
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""  # mmap can't map an empty file
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return base64.b64encode(mapped).decode('ascii')
+
     def read_file_as_content(self, storage_key: str, mime_type: str) -> Optional[Tuple[str, str]]:
         """
         Read a file and return content with encoding info.
@@ -156,18 +245,24 @@ class FileStorage:
             Tuple of (content, encoding) where encoding is "text" or "base64",
             or None if file not found
         """
-        content_bytes = self.read_file(storage_key)
-        if content_bytes is None:
-            return None
-
         if is_text_mime_type(mime_type):
+            content_bytes = self.read_file(storage_key)
+            if content_bytes is None:
+                return None
             try:
                 return content_bytes.decode('utf-8'), "text"
             except UnicodeDecodeError:
                 # Fall back to base64 if not valid UTF-8
                 return base64.b64encode(content_bytes).decode('ascii'), "base64"
-        else:
-            return base64.b64encode(content_bytes).decode('ascii'), "base64"
+
+        file_path = self.get_file_path(storage_key)
+        if file_path is None:
+            return None
+        try:
+            return self._read_base64(file_path), "base64"
+        except OSError as e:
+            logger.error(f"Failed to read file {storage_key}: {e}")
+            return None
 
     def delete_file_version(self, storage_key: str) -> bool:
         """
@@ -233,7 +328,7 @@ class FileStorage:
 
         Args:
             storage_key: The storage key
-            expected_checksum: The expected SHA-256 checksum
+            expected_checksum: The stored checksum (BLAKE3 or SHA-256)
 
         Returns:
             True if checksum matches, False otherwise
@@ -241,7 +336,7 @@ class FileStorage:
         content = self.read_file(storage_key)
         if content is None:
             return False
-        actual_checksum = generate_file_checksum(content)
+        actual_checksum = generate_file_checksum(content, expected_checksum)
         return actual_checksum == expected_checksum
 
     def get_storage_usage(self, squad_id: str) -> int:
@@ -7,10 +7,36 @@ plus security models: squads, enrollment keys, sessions, invites, roles, webhook
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import Enum
+from functools import lru_cache
 from typing import Optional, List
 import uuid
 import secrets
 import hashlib
+import time
+
+# BLAKE3 hashes large uploads several times faster than SHA-256; use it when installed
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+
+# [epoch second, "YYYY-MM-DDTHH:MM:SS"] for the most recent utc_now_iso() call
+_iso_second = [None, ""]
+
+
+def utc_now_iso() -> str:
+    """
+    Same string as datetime.now(timezone.utc).isoformat(), but the date/time
+    prefix is only formatted when the second changes.
+    """
+    sec, us = divmod(time.time_ns() // 1000, 1_000_000)
+    if sec != _iso_second[0]:
+        _iso_second[1] = datetime.fromtimestamp(sec, tz=timezone.utc).isoformat()[:19]
+        _iso_second[0] = sec
+    if us:
+        return f"{_iso_second[1]}.{us:06d}+00:00"
+    return f"{_iso_second[1]}+00:00"
 
 
 class MessageType(Enum):
@@ -78,7 +104,7 @@ class AuthProvider(Enum):
     GOOGLE = "google"         # Google OAuth
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     """A user account (can be linked to Google OAuth or local enrollment)."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -87,7 +113,7 @@ class User:
     picture: Optional[str] = None      # Profile picture URL
     auth_provider: str = "local"       # 'local' or 'google'
     google_id: Optional[str] = None    # Google's unique user ID
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     last_login: Optional[str] = None
     is_active: bool = True
 
@@ -104,13 +130,13 @@ class User:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class SquadMember:
     """A human + their AI agent pair."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
     name: str = ""
     model: str = "unknown"  # claude, chatgpt, gemini, etc.
-    joined_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    joined_at: str = field(default_factory=utc_now_iso)
     is_active: bool = True
     user_id: Optional[str] = None      # Link to User account (for OAuth users)
 
@@ -125,7 +151,7 @@ class SquadMember:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     """A single message in the squad channel."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -133,7 +159,7 @@ class Message:
     sender_name: str = ""
     sender_type: str = "agent"   # human, agent, orchestrator, system
     content: str = ""
-    timestamp: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    timestamp: str = field(default_factory=utc_now_iso)
     reply_to: Optional[str] = None  # Message ID this replies to
 
     def to_dict(self):
@@ -148,12 +174,12 @@ class Message:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ContextEntry:
     """A single committed entry in the canonical context."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
     content: str = ""
-    committed_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    committed_at: str = field(default_factory=utc_now_iso)
     committed_by: str = ""       # Who proposed it
     origin: str = "agent_nominated"  # agent_nominated or orchestrator_detected
     commit_id: str = ""          # Reference to the commit proposal
@@ -171,7 +197,7 @@ class ContextEntry:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class CommitProposal:
     """A proposed addition to canonical context, pending votes."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
@@ -180,7 +206,7 @@ class CommitProposal:
     proposed_by_name: str = ""
     origin: str = "agent_nominated"
     status: str = "pending"      # pending, approved, rejected, expired
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     resolved_at: Optional[str] = None
     consensus_mode: str = "majority"
     timeout_seconds: int = 300   # 5 minutes default for no_objection mode
@@ -199,7 +225,7 @@ class CommitProposal:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Vote:
     """A vote on a commit proposal."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
@@ -208,7 +234,7 @@ class Vote:
     voter_name: str = ""
     choice: str = "approve"      # approve, reject, abstain
     is_human_override: bool = False  # Human overrode their agent's vote
-    voted_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    voted_at: str = field(default_factory=utc_now_iso)
 
     def to_dict(self):
         return {
@@ -230,7 +256,7 @@ class SquadConfig:
     consensus_mode: str = "majority"
     commit_timeout_seconds: int = 300
     max_members: int = 20
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
 
     def to_dict(self):
         return {
@@ -285,7 +311,7 @@ def get_key_prefix(key: str) -> str:
     return key[:16] if len(key) >= 16 else key
 
 
-@dataclass
+@dataclass(slots=True)
 class Squad:
     """A squad instance - an isolated multi-tenant environment."""
     id: str = field(default_factory=generate_squad_id)
@@ -293,7 +319,7 @@ class Squad:
     consensus_mode: str = "majority"
     session_ttl_hours: int = 24
     fingerprint_mode: str = "single_session"  # relaxed, single_session, strict
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     created_by: str = ""  # member_id of creator
     is_active: bool = True
 
@@ -310,7 +336,7 @@ class Squad:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class EnrollmentKey:
     """Long-lived key stored on device for authentication."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
@@ -318,7 +344,7 @@ class EnrollmentKey:
     member_id: str = ""
     key_hash: str = ""        # SHA-256 hash of the full key
     key_prefix: str = ""      # First 16 chars for display/identification
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     expires_at: Optional[str] = None
     is_revoked: bool = False
     revoked_by: Optional[str] = None
@@ -335,7 +361,7 @@ class EnrollmentKey:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Session:
     """Short-lived session (default 24h TTL)."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -345,7 +371,7 @@ class Session:
     token_hash: str = ""      # SHA-256 hash of session token
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     expires_at: str = ""
     is_active: bool = True
 
@@ -363,7 +389,7 @@ class Session:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class InviteCode:
     """Invite code for joining a squad."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
@@ -371,7 +397,7 @@ class InviteCode:
     code: str = field(default_factory=generate_invite_code)
     code_hash: str = ""       # SHA-256 hash of code
     created_by: str = ""      # member_id of creator
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     expires_at: Optional[str] = None
     max_uses: int = 1
     times_used: int = 0
@@ -393,14 +419,14 @@ class InviteCode:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class MemberRole:
     """Role assignment for a member in a squad."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
     squad_id: str = ""
     member_id: str = ""
     role: str = "member"      # 'admin' or 'member'
-    granted_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    granted_at: str = field(default_factory=utc_now_iso)
     granted_by: Optional[str] = None
 
     def to_dict(self):
@@ -414,7 +440,7 @@ class MemberRole:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class SecurityLogEntry:
     """Audit log entry for security events."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -424,7 +450,7 @@ class SecurityLogEntry:
     details: Optional[str] = None  # JSON string with additional details
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
-    timestamp: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    timestamp: str = field(default_factory=utc_now_iso)
 
     def to_dict(self):
         return {
@@ -439,7 +465,7 @@ class SecurityLogEntry:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Webhook:
     """Webhook configuration for external integrations."""
     id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
@@ -448,7 +474,7 @@ class Webhook:
     secret_hash: str = ""     # SHA-256 hash of webhook secret
     event_types: str = "[]"   # JSON array of event types
     created_by: str = ""
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     is_active: bool = True
     failure_count: int = 0
     last_failure: Optional[str] = None
@@ -466,7 +492,7 @@ class Webhook:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class WebhookDelivery:
     """Record of a webhook delivery attempt."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -477,7 +503,7 @@ class WebhookDelivery:
     status: str = "pending"   # pending, success, failed
     response_code: Optional[int] = None
     response_body: Optional[str] = None
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
     delivered_at: Optional[str] = None
 
     def to_dict(self):
@@ -493,12 +519,12 @@ class WebhookDelivery:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class RateLimitEntry:
     """Rate limiting tracking entry."""
     key: str = ""             # e.g., "send_message:{member_id}" or "session_create:{ip}"
     count: int = 0
-    window_start: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    window_start: str = field(default_factory=utc_now_iso)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -517,11 +543,58 @@ MAX_PATH_DEPTH = 3
 FILENAME_PATTERN = r'^[a-zA-Z0-9][a-zA-Z0-9._-]*$'
 
 
-def generate_file_checksum(content: bytes) -> str:
-    """Generate SHA-256 checksum for file content."""
-    return hashlib.sha256(content).hexdigest()
-
-
+def generate_file_id() -> str:
+    """
+    Generate a time-ordered UUIDv7 (RFC 9562) for a shared file.
+    Used both as the DB primary key and in the storage path, so new rows
+    append to the end of the index instead of landing at random pages.
+    """
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(secrets.token_bytes(10), "big")
+    value = (unix_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76                          # version 7
+    value |= ((rand >> 62) & 0xFFF) << 64       # rand_a (12 bits)
+    value |= 0b10 << 62                         # RFC 4122 variant
+    value |= rand & 0x3FFFFFFFFFFFFFFF          # rand_b (62 bits)
+    return str(uuid.UUID(int=value))
+
+
+# New checksums made with BLAKE3 carry this prefix; bare hex digests are SHA-256
+BLAKE3_CHECKSUM_PREFIX = "blake3:"
+
+
+def new_file_hasher(checksum: Optional[str] = None):
+    """
+    Return an incremental hasher for file content. With no argument this is
+    BLAKE3 when available, else SHA-256; given an existing checksum it is the
+    algorithm that checksum was made with.
+    """
+    if checksum is None:
+        use_blake3 = blake3 is not None
+    else:
+        use_blake3 = checksum.startswith(BLAKE3_CHECKSUM_PREFIX)
+        if use_blake3 and blake3 is None:
+            raise ValueError("BLAKE3 checksum given but the blake3 package is not installed")
+    return blake3() if use_blake3 else hashlib.sha256()
+
+
+def file_checksum(hasher) -> str:
+    """Format a new_file_hasher() digest as a stored checksum."""
+    if hasher.name == "blake3":
+        return BLAKE3_CHECKSUM_PREFIX + hasher.hexdigest()
+    return hasher.hexdigest()
+
+
+def generate_file_checksum(content: bytes, checksum: Optional[str] = None) -> str:
+    """Generate a checksum for file content (see new_file_hasher)."""
+    hasher = new_file_hasher(checksum)
+    hasher.update(content)
+    return file_checksum(hasher)
+
+
+# The validators and MIME lookup are pure functions of their string argument
+# and run on every upload, so repeat updates to the same file hit the cache.
+@lru_cache(maxsize=4096)
 def validate_filename(filename: str) -> bool:
     """Validate filename is safe and within limits."""
     import re
@@ -535,6 +608,7 @@ def validate_filename(filename: str) -> bool:
     return True
 
 
+@lru_cache(maxsize=4096)
 def validate_path(path: str) -> bool:
     """Validate path is safe and within depth limit."""
     if not path:
@@ -557,6 +631,7 @@ def validate_path(path: str) -> bool:
     return True
 
 
+@lru_cache(maxsize=4096)
 def guess_mime_type(filename: str) -> str:
     """Guess MIME type from filename extension."""
     ext_map = {
@@ -598,10 +673,10 @@ def is_text_mime_type(mime_type: str) -> bool:
     return False
 
 
-@dataclass
+@dataclass(slots=True)
 class SharedFile:
     """A shared file in a squad's file space."""
-    id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
+    id: str = field(default_factory=generate_file_id)
     squad_id: str = ""
     filename: str = ""
     path: str = ""            # Subfolder path, e.g., "docs/" or "" for root
@@ -612,8 +687,12 @@ class SharedFile:
     uploaded_by_name: str = ""
     description: Optional[str] = None
     is_deleted: bool = False
-    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updated_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: str = field(default_factory=utc_now_iso)
+    updated_at: str = field(default_factory=utc_now_iso)
+    full_path: str = field(init=False, default="")  # path + filename, built once
+
+    def __post_init__(self):
+        self.full_path = f"{self.path}{self.filename}" if self.path else self.filename
 
     def to_dict(self):
         return {
@@ -621,7 +700,7 @@ class SharedFile:
             "squad_id": self.squad_id,
             "filename": self.filename,
             "path": self.path,
-            "full_path": f"{self.path}{self.filename}" if self.path else self.filename,
+            "full_path": self.full_path,
             "mime_type": self.mime_type,
             "size_bytes": self.size_bytes,
             "current_version": self.current_version,
@@ -633,7 +712,7 @@ class SharedFile:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class FileVersion:
     """A version of a shared file."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -642,10 +721,10 @@ class FileVersion:
     size_bytes: int = 0
     uploaded_by: str = ""     # Member ID
     uploaded_by_name: str = ""
-    uploaded_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    uploaded_at: str = field(default_factory=utc_now_iso)
     change_note: Optional[str] = None
     storage_key: str = ""     # Internal path to stored content
-    checksum: str = ""        # SHA-256 for integrity
+    checksum: str = ""        # BLAKE3 ("blake3:...") or SHA-256, for integrity
 
     def to_dict(self):
         return {
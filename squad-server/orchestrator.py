@@ -12,17 +12,42 @@ Multi-squad support: All operations are scoped to a squad_id.
 """
 
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, List, Any, Callable
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, Callable, Tuple
 from models import (
     SquadMember, Message, ContextEntry, CommitProposal, Vote,
     MessageType, CommitStatus, VoteChoice, CommitOrigin, ConsensusMode,
     Squad, EnrollmentKey, InviteCode, SecurityEventType, SharedFile, FileVersion,
-    generate_enrollment_key, hash_token, get_key_prefix,
-    validate_filename, validate_path, guess_mime_type, is_text_mime_type
+    generate_enrollment_key, generate_file_id, hash_token, get_key_prefix, utc_now_iso,
+    validate_filename, validate_path, guess_mime_type, is_text_mime_type,
+    MAX_VERSIONS_PER_FILE
 )
 from database import SquadDatabase
 from file_storage import FileStorage, FileStorageError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Security events are buffered and written in batches of up to this size
+SECURITY_LOG_BATCH_SIZE = 256
+SECURITY_LOG_FLUSH_INTERVAL = 1.0  # seconds
+# Most events held while writes fail or fall behind; beyond it the oldest are
+# dropped, with a warning
+SECURITY_LOG_MAX_QUEUED = 10000
+
+# (divisor, unit) for _format_size, one entry per power of 1024
+_SIZE_UNITS = ((1, "B"), (1024, "KB"), (1024 ** 2, "MB"), (1024 ** 3, "GB"))
+
+# Commit proposal announcements, by origin
+_VOTE_HINT = "Vote with `squad_vote(commit_id='{cid}', choice='approve')` or `'reject'`"
+_PROPOSAL_ANNOUNCEMENT = "**{proposer}** proposes to commit: \"{content}\"\n\n" + _VOTE_HINT
+_CONVERGENCE_ANNOUNCEMENT = "**Squad Bot** detected convergence: \"{content}\"\n\n" + _VOTE_HINT
 
 
 class Orchestrator:
@@ -42,13 +67,27 @@ class Orchestrator:
         self.consensus_mode = consensus_mode
         self._event_listeners: Dict[str, List[Callable]] = {}  # squad_id -> listeners
         self._global_listeners: List[Callable] = []
+        self._dispatch: Dict[str, tuple] = {}  # squad_id -> squad + global listeners
+        # Per thread, so a block deferring on the worker can't collect
+        # events fired on the event loop, or the reverse
+        self._deferred = threading.local()  # .events: Optional[List[dict]]
+        self._ctx_cache: Dict[str, Tuple[int, dict]] = {}  # squad_id -> (version, context)
         self._webhook_manager = webhook_manager
         self._file_storage = file_storage or FileStorage()
+        self._security_queue: deque = deque(maxlen=SECURITY_LOG_MAX_QUEUED)
+        self._security_dropped = 0  # events evicted since the last warning
+        self._security_flush_task: Optional[asyncio.Task] = None
+        self._worker: Optional[ThreadPoolExecutor] = None  # created by run_in_worker()
 
     def set_webhook_manager(self, webhook_manager):
         """Set the webhook manager for event triggering."""
         self._webhook_manager = webhook_manager
 
+    @property
+    def file_storage(self) -> FileStorage:
+        """The storage backing this orchestrator's shared files."""
+        return self._file_storage
+
     def register_listener(self, callback: Callable, squad_id: Optional[str] = None):
         """
         Register a callback for real-time events (WebSocket broadcasting).
@@ -60,6 +99,7 @@ class Orchestrator:
             self._event_listeners[squad_id].append(callback)
         else:
             self._global_listeners.append(callback)
+        self._dispatch.clear()
 
     def unregister_listener(self, callback: Callable, squad_id: Optional[str] = None):
         """Remove a listener."""
@@ -68,50 +108,190 @@ class Orchestrator:
                 self._event_listeners[squad_id].remove(callback)
         elif callback in self._global_listeners:
             self._global_listeners.remove(callback)
+        self._dispatch.clear()
+
+    def _listeners_for(self, squad_id: str) -> tuple:
+        """
+        Squad-specific then global listeners, as one tuple built on first use
+        and reused until the listener set changes.
+        """
+        listeners = self._dispatch.get(squad_id)
+        if listeners is None:
+            listeners = tuple(self._event_listeners.get(squad_id, ())) + tuple(self._global_listeners)
+            self._dispatch[squad_id] = listeners
+        return listeners
 
     def _broadcast(self, event_type: str, data: dict, squad_id: str = "default"):
         """Notify all listeners of an event, scoped to squad."""
-        event = {
+        self._emit({
             "type": event_type,
             "data": data,
             "squad_id": squad_id,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": utc_now_iso()
+        })
+
+    def _emit(self, event: dict):
+        """Deliver a built event now, or hold it inside _deferred_broadcasts()."""
+        # Inside _deferred_broadcasts(): hold until the writes are committed
+        deferred = getattr(self._deferred, "events", None)
+        if deferred is not None:
+            deferred.append(event)
+            return
+
+        self._broadcast_many([event])
+
+    def _broadcast_many(self, events: List[dict]):
+        """Deliver already-built events to listeners and webhooks, in order."""
+        for event in events:
+            squad_id = event["squad_id"]
+
+            # Notify squad-specific listeners, then global listeners
+            for listener in self._listeners_for(squad_id):
+                try:
+                    listener(event)
+                except Exception:
+                    pass
+
+            # Trigger webhooks
+            if self._webhook_manager:
+                try:
+                    self._webhook_manager.trigger(squad_id, event["type"], event["data"])
+                except Exception:
+                    pass
+
+    @contextmanager
+    def _deferred_broadcasts(self):
+        """
+        Queue every _broadcast made inside the block and deliver them together
+        on a clean exit. Events are dropped if the block raises, since the
+        writes they announce were rolled back.
+        """
+        if getattr(self._deferred, "events", None) is not None:
+            yield
+            return
+        self._deferred.events = events = []
+        try:
+            yield
+        finally:
+            self._deferred.events = None
+        self._broadcast_many(events)
+
+    def _emit_system(self, content: str, squad_id: str = "default",
+                     sender_type: str = "system") -> dict:
+        """Store a Squad Bot announcement and broadcast it. Returns the message dict."""
+        # Built directly in Message.to_dict() shape; only these fields vary
+        msg = {
+            "id": str(uuid.uuid4()),
+            "sender_id": "orchestrator",
+            "sender_name": "Squad Bot",
+            "sender_type": sender_type,
+            "content": content,
+            "timestamp": utc_now_iso(),
+            "reply_to": None,
         }
+        self.db.add_message_dict(msg, squad_id)
+        self._broadcast_new_message(msg, squad_id)
+        return msg
+
+    # Per-event broadcasters for the highest-volume events, each building its
+    # event with the type as a constant
+
+    def _broadcast_new_message(self, data: dict, squad_id: str = "default"):
+        self._emit({"type": "new_message", "data": data, "squad_id": squad_id, "timestamp": utc_now_iso()})
+
+    def _broadcast_member_joined(self, data: dict, squad_id: str = "default"):
+        self._emit({"type": "member_joined", "data": data, "squad_id": squad_id, "timestamp": utc_now_iso()})
+
+    def _broadcast_member_left(self, data: dict, squad_id: str = "default"):
+        self._emit({"type": "member_left", "data": data, "squad_id": squad_id, "timestamp": utc_now_iso()})
+
+    def _broadcast_file_uploaded(self, data: dict, squad_id: str = "default"):
+        self._emit({"type": "file_uploaded", "data": data, "squad_id": squad_id, "timestamp": utc_now_iso()})
+
+    def _broadcast_vote_cast(self, data: dict, squad_id: str = "default"):
+        self._emit({"type": "vote_cast", "data": data, "squad_id": squad_id, "timestamp": utc_now_iso()})
 
-        # Notify squad-specific listeners
-        listeners = self._event_listeners.get(squad_id, [])
-        for listener in listeners:
+    def _log_security_event(self, event_type: str, squad_id: str, member_id: Optional[str] = None,
+                            details: Optional[dict] = None, ip_address: Optional[str] = None,
+                            user_agent: Optional[str] = None):
+        """
+        Queue a security event. Nothing waits on the write, so events are
+        buffered and inserted in batches by flush_security_log().
+        """
+        if len(self._security_queue) == SECURITY_LOG_MAX_QUEUED:
+            # The append below evicts the oldest event
+            if not self._security_dropped:
+                logger.warning("Security log queue is full; dropping the oldest unwritten events")
+            self._security_dropped += 1
+        self._security_queue.append((
+            event_type, squad_id, member_id, details, ip_address, user_agent,
+            utc_now_iso()
+        ))
+        # A full batch is written now, unless that would tie it to the
+        # caller's transaction; a failed write is left for the flush loop
+        if len(self._security_queue) >= SECURITY_LOG_BATCH_SIZE and not self.db.in_transaction:
             try:
-                listener(event)
+                self.flush_security_log()
             except Exception:
                 pass
 
-        # Notify global listeners
-        for listener in self._global_listeners:
+    def flush_security_log(self) -> int:
+        """
+        Write all queued security events to the database. A batch that fails
+        to insert goes back on the front of the queue for the next flush.
+        """
+        queue = self._security_queue
+        written = 0
+        while queue:
+            batch = [queue.popleft() for _ in range(min(SECURITY_LOG_BATCH_SIZE, len(queue)))]
             try:
-                listener(event)
+                written += self.db.log_security_events(batch)
             except Exception:
-                pass
-
-        # Trigger webhooks
-        if self._webhook_manager:
+                queue.extendleft(reversed(batch))
+                raise
+        if self._security_dropped:
+            logger.warning(f"Security log queue overflowed; {self._security_dropped} events were dropped")
+            self._security_dropped = 0
+        return written
+
+    async def _security_flush_loop(self):
+        """Background loop that drains the security event queue."""
+        while True:
+            await asyncio.sleep(SECURITY_LOG_FLUSH_INTERVAL)
             try:
-                self._webhook_manager.trigger(squad_id, event_type, data)
+                if self._worker:
+                    await self.run_in_worker(self.flush_security_log)
+                else:
+                    self.flush_security_log()
             except Exception:
                 pass
 
-    def _log_security_event(self, event_type: str, squad_id: str, member_id: Optional[str] = None,
-                            details: Optional[dict] = None, ip_address: Optional[str] = None,
-                            user_agent: Optional[str] = None):
-        """Log a security event."""
-        self.db.log_security_event(
-            event_type=event_type,
-            squad_id=squad_id,
-            member_id=member_id,
-            details=details,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+    async def run_in_worker(self, fn: Callable, *args):
+        """
+        Run a blocking orchestrator call without stalling the event loop.
+        Every call goes through one worker thread, and the database holds its
+        lock per call and per transaction, so calls made here and calls made
+        on the loop still reach it one at a time. Background flushes follow
+        automatically once a process uses this.
+        """
+        if self._worker is None:
+            self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orchestrator")
+        return await asyncio.get_running_loop().run_in_executor(self._worker, fn, *args)
+
+    def start(self):
+        """Start background work (security log flushing)."""
+        if not self._security_flush_task:
+            self._security_flush_task = asyncio.create_task(self._security_flush_loop())
+
+    def stop(self):
+        """Stop background work and flush anything still queued."""
+        if self._security_flush_task:
+            self._security_flush_task.cancel()
+            self._security_flush_task = None
+        if self._worker:
+            self._worker.shutdown(wait=True)
+            self._worker = None
+        self.flush_security_log()
 
     # ══════════════════════════════════════════════════════════════════════
     # SQUAD MANAGEMENT
@@ -122,26 +302,22 @@ class Orchestrator:
         Create a new squad and return the squad info plus initial enrollment key.
         The creator becomes the first member and admin.
         """
-        # Create squad
         squad = Squad(name=name)
-        self.db.create_squad(squad)
-
-        # Create member
         member = SquadMember(name=creator_name, model=creator_model)
-        self.db.add_member(member, squad.id)
-
-        # Set creator as admin
-        self.db.set_member_role(squad.id, member.id, "admin")
 
-        # Create enrollment key
-        enrollment_key, raw_key = self.db.create_enrollment_key(squad.id, member.id)
+        # Squad, creator, admin role and first key land in one transaction
+        with self.db.transaction():
+            self.db.create_squad(squad)
+            self.db.add_member(member, squad.id)
+            self.db.set_member_role(squad.id, member.id, "admin")
+            enrollment_key, raw_key = self.db.create_enrollment_key(squad.id, member.id)
 
-        self._log_security_event(
-            SecurityEventType.SQUAD_CREATED.value,
-            squad_id=squad.id,
-            member_id=member.id,
-            details={"squad_name": name}
-        )
+            self._log_security_event(
+                SecurityEventType.SQUAD_CREATED.value,
+                squad_id=squad.id,
+                member_id=member.id,
+                details={"squad_name": name}
+            )
 
         return {
             "success": True,
@@ -195,20 +371,13 @@ class Orchestrator:
         member = SquadMember(name=name, model=model)
         self.db.add_member(member, squad_id)
 
-        # System message
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{name}** joined the squad (using {model})"
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("member_joined", member.to_dict(), squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+        member_dict = member.to_dict()
+        self._broadcast_member_joined(member_dict, squad_id)
+        self._emit_system(f"**{name}** joined the squad (using {model})", squad_id)
 
         return {
             "success": True,
-            "member": member.to_dict(),
+            "member": member_dict,
             "message": f"Welcome to the squad, {name}! You're using {model}. "
                        f"Use squad_read to see the conversation and squad_context to see canonical context."
         }
@@ -221,15 +390,8 @@ class Orchestrator:
 
         self.db.remove_member(member.id, squad_id)
 
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{name}** left the squad"
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("member_left", {"name": name, "id": member.id}, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+        self._broadcast_member_left({"name": name, "id": member.id}, squad_id)
+        self._emit_system(f"**{name}** left the squad", squad_id)
 
         return {"success": True, "message": f"{name} has left the squad"}
 
@@ -267,48 +429,43 @@ class Orchestrator:
 
     def redeem_invite(self, code: str, name: str, model: str = "unknown") -> dict:
         """Redeem an invite code to join a squad."""
-        invite = self.db.validate_invite_code(code)
-        if not invite:
-            return {"success": False, "error": "Invalid or expired invite code"}
+        # Validation and all writes share one transaction, so two people
+        # racing for the last use of an invite can't both get in.
+        with self._deferred_broadcasts(), self.db.transaction():
+            invite = self.db.validate_invite_code(code)
+            if not invite:
+                return {"success": False, "error": "Invalid or expired invite code"}
 
-        # Check if name matches target (if set)
-        if invite.target_name and invite.target_name.lower() != name.lower():
-            return {"success": False, "error": f"This invite is for {invite.target_name}"}
+            # Check if name matches target (if set)
+            if invite.target_name and invite.target_name.lower() != name.lower():
+                return {"success": False, "error": f"This invite is for {invite.target_name}"}
 
-        squad_id = invite.squad_id
+            squad_id = invite.squad_id
 
-        # Check if name already exists
-        existing = self.db.get_member_by_name(name, squad_id)
-        if existing and existing.is_active:
-            return {"success": False, "error": f"'{name}' is already in the squad"}
+            # Check if name already exists
+            existing = self.db.get_member_by_name(name, squad_id)
+            if existing and existing.is_active:
+                return {"success": False, "error": f"'{name}' is already in the squad"}
 
-        # Create member
-        member = SquadMember(name=name, model=model)
-        self.db.add_member(member, squad_id)
+            # Create member
+            member = SquadMember(name=name, model=model)
+            self.db.add_member(member, squad_id)
 
-        # Create enrollment key
-        enrollment_key, raw_key = self.db.create_enrollment_key(squad_id, member.id)
+            # Create enrollment key
+            enrollment_key, raw_key = self.db.create_enrollment_key(squad_id, member.id)
 
-        # Increment invite uses
-        self.db.increment_invite_uses(invite.id)
+            # Increment invite uses
+            self.db.increment_invite_uses(invite.id)
 
-        self._log_security_event(
-            SecurityEventType.INVITE_REDEEMED.value,
-            squad_id=squad_id,
-            member_id=member.id,
-            details={"invite_id": invite.id, "code": code}
-        )
+            self._log_security_event(
+                SecurityEventType.INVITE_REDEEMED.value,
+                squad_id=squad_id,
+                member_id=member.id,
+                details={"invite_id": invite.id, "code": code}
+            )
 
-        # System message
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{name}** joined the squad (using {model})"
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("member_joined", member.to_dict(), squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+            self._broadcast_member_joined(member.to_dict(), squad_id)
+            self._emit_system(f"**{name}** joined the squad (using {model})", squad_id)
 
         return {
             "success": True,
@@ -376,16 +533,8 @@ class Orchestrator:
             details={"kicked_member": member.id, "kicked_name": member_name}
         )
 
-        # System message
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{member_name}** was removed from the squad"
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("member_left", {"name": member_name, "id": member.id}, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+        self._broadcast_member_left({"name": member_name, "id": member.id}, squad_id)
+        self._emit_system(f"**{member_name}** was removed from the squad", squad_id)
 
         return {"success": True, "message": f"{member_name} has been removed"}
 
@@ -477,6 +626,7 @@ class Orchestrator:
         if not self.db.is_admin(squad_id, admin_id):
             return {"success": False, "error": "Admin access required"}
 
+        self.flush_security_log()
         entries = self.db.get_security_log(squad_id, limit)
         return {
             "success": True,
@@ -552,12 +702,12 @@ class Orchestrator:
         Returns:
             Dict with files list and storage stats
         """
-        files = self.db.list_files(squad_id, path=path, sort_by=sort_by)
+        files = self.db.list_files_projection(squad_id, path=path, sort_by=sort_by)
         stats = self.db.get_squad_storage_stats(squad_id)
 
         return {
             "success": True,
-            "files": [f.to_dict() for f in files],
+            "files": files,
             "count": len(files),
             "storage": stats
         }
@@ -576,20 +726,47 @@ class Orchestrator:
         Returns:
             Dict with file metadata and content
         """
-        # Get file metadata
+        located = self.locate_file_version(squad_id, filename, path, version)
+        if isinstance(located, dict):
+            return located
+        file, file_version = located
+        result = self._file_storage.read_file_as_content(file_version.storage_key, file.mime_type)
+        return self._file_read_result(file, file_version, result)
+
+    async def read_file_offloaded(self, squad_id: str, filename: str, path: str = "",
+                                  version: int = None, located: Optional[tuple] = None) -> dict:
+        """
+        read_file() for callers on the event loop. The metadata lookup stays
+        on the calling thread with the rest of the database work; only the
+        storage read and base64 encoding, which touch no shared state, run
+        in a thread. A caller that already has locate_file_version()'s
+        (file, file_version) passes it as located to skip the lookup.
+        """
+        if located is None:
+            located = self.locate_file_version(squad_id, filename, path, version)
+        if isinstance(located, dict):
+            return located
+        file, file_version = located
+        result = await asyncio.to_thread(
+            self._file_storage.read_file_as_content, file_version.storage_key, file.mime_type
+        )
+        return self._file_read_result(file, file_version, result)
+
+    def locate_file_version(self, squad_id: str, filename: str, path: str,
+                             version: Optional[int]):
+        """Return (file, file_version) to read, or an error dict."""
         file = self.db.get_file(squad_id, filename, path)
         if not file:
             return {"success": False, "error": f"File not found: {path}{filename}"}
 
-        # Get specific version
         file_version = self.db.get_file_version(file.id, version)
         if not file_version:
             return {"success": False, "error": f"Version not found: v{version}"}
+        return file, file_version
 
-        # Read content
-        result = self._file_storage.read_file_as_content(
-            file_version.storage_key, file.mime_type
-        )
+    @staticmethod
+    def _file_read_result(file: SharedFile, file_version: FileVersion, result: Optional[tuple]) -> dict:
+        """Build read_file()'s response from read_file_as_content()'s result."""
         if result is None:
             return {"success": False, "error": "File content not found in storage"}
 
@@ -603,6 +780,7 @@ class Orchestrator:
             "version": file_version.version,
             "current_version": file.current_version,
             "size_bytes": file_version.size_bytes,
+            "checksum": file_version.checksum,
             "content": content,
             "encoding": encoding,
             "uploaded_by": file_version.uploaded_by_name,
@@ -648,6 +826,10 @@ class Orchestrator:
         if not mime_type:
             mime_type = guess_mime_type(filename)
 
+        # Resolve "auto" once here; the MIME type fully decides it
+        if encoding == "auto":
+            encoding = "text" if is_text_mime_type(mime_type) else "base64"
+
         # Check if file exists
         existing_file = self.db.get_file(squad_id, filename, path)
 
@@ -668,8 +850,7 @@ class Orchestrator:
                          filename: str, path: str, content: str, mime_type: str,
                          encoding: str, description: str = None) -> dict:
         """Create a new file."""
-        import uuid
-        file_id = str(uuid.uuid4())[:8]
+        file_id = generate_file_id()
 
         try:
             # Store content
@@ -686,48 +867,41 @@ class Orchestrator:
             self._file_storage.delete_file_version(storage_key)
             return {"success": False, "error": error}
 
-        # Create database record
-        file, version = self.db.create_file(
-            squad_id=squad_id,
-            filename=filename,
-            path=path,
-            mime_type=mime_type,
-            size_bytes=size_bytes,
-            uploaded_by=member_id,
-            uploaded_by_name=member_name,
-            storage_key=storage_key,
-            checksum=checksum,
-            description=description
-        )
-
-        # Update file_id to match what we used for storage
-        # Note: The db.create_file generates its own ID, but we've already stored with our ID
-        # This is a slight inconsistency - in production, we'd pass the file_id to create_file
-
-        # Broadcast event
         full_path = f"{path}{filename}" if path else filename
-        self._broadcast("file_uploaded", {
-            "file_id": file.id,
-            "filename": filename,
-            "path": path,
-            "full_path": full_path,
-            "version": 1,
-            "size_bytes": size_bytes,
-            "uploaded_by": member_name,
-            "is_new": True
-        }, squad_id)
-
-        # System message
         size_str = self._format_size(size_bytes)
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{member_name}** uploaded {full_path} (v1, {size_str})"
-                    + (f'\n   "{description}"' if description else "")
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+
+        # File record and system message are persisted in one commit, and
+        # both events go out afterwards
+        with self._deferred_broadcasts(), self.db.transaction():
+            file, version = self.db.create_file(
+                squad_id=squad_id,
+                filename=filename,
+                path=path,
+                mime_type=mime_type,
+                size_bytes=size_bytes,
+                uploaded_by=member_id,
+                uploaded_by_name=member_name,
+                storage_key=storage_key,
+                checksum=checksum,
+                description=description,
+                file_id=file_id
+            )
+
+            self._broadcast_file_uploaded({
+                "file_id": file.id,
+                "filename": filename,
+                "path": path,
+                "full_path": full_path,
+                "version": 1,
+                "size_bytes": size_bytes,
+                "uploaded_by": member_name,
+                "is_new": True
+            }, squad_id)
+            self._emit_system(
+                f"**{member_name}** uploaded {full_path} (v1, {size_str})"
+                + (f'\n   "{description}"' if description else ""),
+                squad_id
+            )
 
         return {
             "success": True,
@@ -743,6 +917,11 @@ class Orchestrator:
                           member_name: str, content: str, mime_type: str,
                           encoding: str, change_note: str = None) -> dict:
         """Add a new version to an existing file."""
+        # Versions are never deleted individually, so current_version is the
+        # version count; check it before storing anything
+        if file.current_version >= MAX_VERSIONS_PER_FILE:
+            return {"success": False, "error": f"Maximum of {MAX_VERSIONS_PER_FILE} versions reached"}
+
         new_version = file.current_version + 1
 
         try:
@@ -759,54 +938,42 @@ class Orchestrator:
             self._file_storage.delete_file_version(storage_key)
             return {"success": False, "error": error}
 
-        # Check version limit
-        version_count = self.db.get_file_version_count(file.id)
-        from models import MAX_VERSIONS_PER_FILE
-        if version_count >= MAX_VERSIONS_PER_FILE:
-            self._file_storage.delete_file_version(storage_key)
-            return {"success": False, "error": f"Maximum of {MAX_VERSIONS_PER_FILE} versions reached"}
+        full_path = file.full_path
+        size_str = self._format_size(size_bytes)
 
-        # Add version
-        version = self.db.add_file_version(
-            file_id=file.id,
-            size_bytes=size_bytes,
-            uploaded_by=member_id,
-            uploaded_by_name=member_name,
-            storage_key=storage_key,
-            checksum=checksum,
-            change_note=change_note
-        )
+        # Version row and system message go out in one commit
+        with self._deferred_broadcasts(), self.db.transaction():
+            version = self.db.add_file_version(
+                file_id=file.id,
+                size_bytes=size_bytes,
+                uploaded_by=member_id,
+                uploaded_by_name=member_name,
+                storage_key=storage_key,
+                checksum=checksum,
+                change_note=change_note
+            )
+            if version:
+                self._broadcast_file_uploaded({
+                    "file_id": file.id,
+                    "filename": file.filename,
+                    "path": file.path,
+                    "full_path": full_path,
+                    "version": new_version,
+                    "size_bytes": size_bytes,
+                    "uploaded_by": member_name,
+                    "is_new": False,
+                    "change_note": change_note
+                }, squad_id)
+                self._emit_system(
+                    f"**{member_name}** updated {full_path} (v{new_version}, {size_str})"
+                    + (f'\n   "{change_note}"' if change_note else ""),
+                    squad_id
+                )
 
         if not version:
             self._file_storage.delete_file_version(storage_key)
             return {"success": False, "error": "Failed to create file version"}
 
-        # Broadcast event
-        full_path = f"{file.path}{file.filename}" if file.path else file.filename
-        self._broadcast("file_uploaded", {
-            "file_id": file.id,
-            "filename": file.filename,
-            "path": file.path,
-            "full_path": full_path,
-            "version": new_version,
-            "size_bytes": size_bytes,
-            "uploaded_by": member_name,
-            "is_new": False,
-            "change_note": change_note
-        }, squad_id)
-
-        # System message
-        size_str = self._format_size(size_bytes)
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{member_name}** updated {full_path} (v{new_version}, {size_str})"
-                    + (f'\n   "{change_note}"' if change_note else "")
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
-
         return {
             "success": True,
             "file_id": file.id,
@@ -848,7 +1015,7 @@ class Orchestrator:
             return {"success": False, "error": "Failed to delete file"}
 
         # Broadcast event
-        full_path = f"{path}{filename}" if path else filename
+        full_path = file.full_path
         self._broadcast("file_deleted", {
             "file_id": file.id,
             "filename": filename,
@@ -856,15 +1023,7 @@ class Orchestrator:
             "deleted_by": admin_name
         }, squad_id)
 
-        # System message
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"**{admin_name}** deleted {full_path}"
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+        self._emit_system(f"**{admin_name}** deleted {full_path}", squad_id)
 
         return {"success": True, "message": f"File deleted: {full_path}"}
 
@@ -917,12 +1076,12 @@ class Orchestrator:
 
     def _format_size(self, size_bytes: int) -> str:
         """Format file size for display."""
-        if size_bytes < 1024:
+        # Each unit spans 10 bits, so bit_length picks the bin directly
+        idx = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+        if idx <= 0:
             return f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            return f"{size_bytes / 1024:.1f} KB"
-        else:
-            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        divisor, unit = _SIZE_UNITS[idx]
+        return f"{size_bytes / divisor:.1f} {unit}"
 
     # ══════════════════════════════════════════════════════════════════════
     # MESSAGING
@@ -936,21 +1095,27 @@ class Orchestrator:
         if not member:
             return {"success": False, "error": f"'{sender_name}' is not in the squad. Join first."}
 
-        msg = Message(
-            sender_id=member.id,
-            sender_name=sender_name,
-            sender_type=sender_type,
-            content=content,
-            reply_to=reply_to
-        )
-        self.db.add_message(msg, squad_id)
-        self._broadcast("new_message", msg.to_dict(), squad_id)
+        # Stored and broadcast in Message.to_dict() shape, with no dataclass
+        msg = {
+            "id": str(uuid.uuid4()),
+            "sender_id": member.id,
+            "sender_name": sender_name,
+            "sender_type": sender_type,
+            "content": content,
+            "timestamp": utc_now_iso(),
+            "reply_to": reply_to,
+        }
+        self.db.add_message_dict(msg, squad_id)
+        self._broadcast_new_message(msg, squad_id)
 
-        return {"success": True, "message_id": msg.id, "timestamp": msg.timestamp}
+        return {"success": True, "message_id": msg["id"], "timestamp": msg["timestamp"]}
 
     def read_messages(self, since: Optional[str] = None, limit: int = 50,
                       squad_id: str = "default") -> list[dict]:
         """Read recent messages from the squad channel."""
+        # Polling with nothing new: the result is known without a query
+        if since and since >= self.db.latest_message_timestamp(squad_id):
+            return []
         messages = self.db.get_messages(since=since, limit=limit, squad_id=squad_id)
         return [m.to_dict() for m in messages]
 
@@ -960,13 +1125,24 @@ class Orchestrator:
 
     def get_context(self, squad_id: str = "default") -> dict:
         """Read the current canonical context — the squad's shared truth."""
+        stored = self.db.get_context_summary(squad_id)
+        version = stored[0] if stored else self.db.get_context_version(squad_id)
+        cached = self._ctx_cache.get(squad_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
         entries = self.db.get_context(squad_id)
-        version = self.db.get_context_version(squad_id)
-        return {
+        if stored:
+            summary = stored[1]
+        else:
+            summary = "\n".join([f"[v{e.version}] {e.content}" for e in entries])
+        context = {
             "version": version,
             "entries": [e.to_dict() for e in entries],
-            "summary": "\n".join([f"[v{e.version}] {e.content}" for e in entries])
+            "summary": summary
         }
+        self._ctx_cache[squad_id] = (version, context)
+        return context
 
     # ══════════════════════════════════════════════════════════════════════
     # COMMIT PROTOCOL
@@ -996,23 +1172,11 @@ class Orchestrator:
         self.db.add_commit(proposal, squad_id)
 
         # Announce the proposal
-        if origin == "agent_nominated":
-            announcement = f"**{proposer_name}** proposes to commit: \"{content}\"\n\n" \
-                          f"Vote with `squad_vote(commit_id='{proposal.id}', choice='approve')` " \
-                          f"or `'reject'`"
-        else:
-            announcement = f"**Squad Bot** detected convergence: \"{content}\"\n\n" \
-                          f"Vote with `squad_vote(commit_id='{proposal.id}', choice='approve')` " \
-                          f"or `'reject'`"
-
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="orchestrator",
-            content=announcement
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+        template = (_PROPOSAL_ANNOUNCEMENT if origin == "agent_nominated"
+                    else _CONVERGENCE_ANNOUNCEMENT)
+        announcement = template.format(proposer=proposer_name, content=content, cid=proposal.id)
+
+        self._emit_system(announcement, squad_id, sender_type="orchestrator")
         self._broadcast("commit_proposed", proposal.to_dict(), squad_id)
 
         return {
@@ -1037,152 +1201,193 @@ class Orchestrator:
         if choice not in ("approve", "reject", "abstain"):
             return {"success": False, "error": "Choice must be 'approve', 'reject', or 'abstain'"}
 
-        vote = Vote(
-            commit_id=commit_id,
-            voter_id=member.id,
-            voter_name=voter_name,
-            choice=choice,
-            is_human_override=is_human_override
-        )
-        self.db.add_vote(vote, squad_id)
+        # Built directly in Vote.to_dict() shape; stored, broadcast and returned as-is
+        vote = {
+            "id": str(uuid.uuid4())[:8],
+            "commit_id": commit_id,
+            "voter_id": member.id,
+            "voter_name": voter_name,
+            "choice": choice,
+            "is_human_override": is_human_override,
+            "voted_at": utc_now_iso(),
+        }
 
         override_note = " (human override)" if is_human_override else ""
         emoji = "+" if choice == "approve" else ("-" if choice == "reject" else "~")
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="system",
-            content=f"[{emoji}] **{voter_name}** voted **{choice}** on commit `{commit_id}`{override_note}"
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
-        self._broadcast("vote_cast", vote.to_dict(), squad_id)
 
-        # Check if consensus is reached
-        result = self._evaluate_consensus(commit_id, squad_id)
+        # Vote, announcement and any resolution it triggers commit together;
+        # the resulting events go out once the transaction is done
+        with self._deferred_broadcasts(), self.db.transaction():
+            self.db.add_vote_dict(vote, squad_id)
+            self._emit_system(
+                f"[{emoji}] **{voter_name}** voted **{choice}** on commit `{commit_id}`{override_note}",
+                squad_id
+            )
+            self._broadcast_vote_cast(vote, squad_id)
+
+            # Check if consensus is reached
+            result = self._evaluate_consensus(commit_id, squad_id, proposal=proposal)
+
         return {
             "success": True,
-            "vote": vote.to_dict(),
+            "vote": vote,
             "consensus_result": result
         }
 
-    def _evaluate_consensus(self, commit_id: str, squad_id: str = "default") -> dict:
-        """Evaluate whether a commit has reached consensus."""
-        proposal = self.db.get_commit(commit_id)
-        votes = self.db.get_votes_for_commit(commit_id)
-        active_members = self.db.get_active_members(squad_id)
-
-        # Don't count the proposer if they're the orchestrator
-        eligible_voters = [m for m in active_members]
-        total_eligible = len(eligible_voters)
-        total_voted = len(votes)
-
-        approvals = sum(1 for v in votes if v.choice == "approve")
-        rejections = sum(1 for v in votes if v.choice == "reject")
-        abstentions = sum(1 for v in votes if v.choice == "abstain")
+    @staticmethod
+    def _tally_votes(votes: List[Vote]) -> tuple:
+        """
+        Count votes in one pass.
+        Returns (approvals, rejections, abstentions, human_veto_names).
+        """
+        approvals = rejections = abstentions = 0
+        human_rejections = []
+        for v in votes:
+            choice = v.choice
+            if choice == "approve":
+                approvals += 1
+            elif choice == "reject":
+                rejections += 1
+                if v.is_human_override:
+                    human_rejections.append(v.voter_name)
+            elif choice == "abstain":
+                abstentions += 1
+        return approvals, rejections, abstentions, human_rejections
+
+    def _evaluate_consensus(self, commit_id: str, squad_id: str = "default",
+                            proposal: Optional[CommitProposal] = None) -> dict:
+        """
+        Evaluate whether a commit has reached consensus.
+        Pass proposal when the caller already loaded it to skip the re-read.
+        """
+        if proposal is None:
+            proposal = self.db.get_commit(commit_id)
+        tally = self.db.get_vote_tally(commit_id)
+        total_eligible = self.db.get_active_member_count(squad_id)
+        total_voted = tally["total"]
+
+        approvals = tally["approve"]
+        rejections = tally["reject"]
+        human_rejections = tally["human_rejections"]
+
+        # Decide first, then apply the resolution once at the end
+        decision = None  # (status, reason, rejection announcement)
+        mode = proposal.consensus_mode
 
         # Check for human overrides (rejections from humans always block)
-        human_rejections = [v for v in votes if v.choice == "reject" and v.is_human_override]
         if human_rejections:
-            self._resolve_commit(commit_id, "rejected",
-                                 f"Commit `{commit_id}` **rejected** - human veto by "
-                                 f"{', '.join(v.voter_name for v in human_rejections)}",
-                                 squad_id)
-            return {"status": "rejected", "reason": "human_veto"}
+            decision = ("rejected", "human_veto",
+                        f"Commit `{commit_id}` **rejected** - human veto by "
+                        f"{', '.join(human_rejections)}")
 
-        mode = proposal.consensus_mode
-
-        if mode == "unanimous":
+        elif mode == "unanimous":
             if rejections > 0:
-                self._resolve_commit(commit_id, "rejected",
-                                     f"Commit `{commit_id}` **rejected** (unanimous required, got {rejections} rejection(s))",
-                                     squad_id)
-                return {"status": "rejected", "reason": "not_unanimous"}
-            if approvals == total_eligible:
-                self._commit_to_context(proposal, squad_id)
-                return {"status": "approved", "reason": "unanimous"}
+                decision = ("rejected", "not_unanimous",
+                            f"Commit `{commit_id}` **rejected** (unanimous required, got {rejections} rejection(s))")
+            elif approvals == total_eligible:
+                decision = ("approved", "unanimous", None)
 
         elif mode == "majority":
             if total_voted >= total_eligible:
                 # Everyone voted
                 if approvals > total_eligible / 2:
-                    self._commit_to_context(proposal, squad_id)
-                    return {"status": "approved", "reason": f"majority ({approvals}/{total_eligible})"}
+                    decision = ("approved", f"majority ({approvals}/{total_eligible})", None)
                 else:
-                    self._resolve_commit(commit_id, "rejected",
-                                         f"Commit `{commit_id}` **rejected** ({approvals}/{total_eligible} approved, majority needed)",
-                                         squad_id)
-                    return {"status": "rejected", "reason": "no_majority"}
+                    decision = ("rejected", "no_majority",
+                                f"Commit `{commit_id}` **rejected** ({approvals}/{total_eligible} approved, majority needed)")
             elif approvals > total_eligible / 2:
                 # Already have majority even without all votes
-                self._commit_to_context(proposal, squad_id)
-                return {"status": "approved", "reason": f"early_majority ({approvals}/{total_eligible})"}
+                decision = ("approved", f"early_majority ({approvals}/{total_eligible})", None)
 
         elif mode == "no_objection":
             if rejections > 0:
-                self._resolve_commit(commit_id, "rejected",
-                                     f"Commit `{commit_id}` **rejected** (objection raised)",
-                                     squad_id)
-                return {"status": "rejected", "reason": "objection_raised"}
+                decision = ("rejected", "objection_raised",
+                            f"Commit `{commit_id}` **rejected** (objection raised)")
             # Would normally check timeout here — in production, run a background task
 
-        return {
-            "status": "pending",
-            "votes_in": total_voted,
-            "votes_needed": total_eligible,
-            "approvals": approvals,
-            "rejections": rejections
-        }
+        if decision is None:
+            return {
+                "status": "pending",
+                "votes_in": total_voted,
+                "votes_needed": total_eligible,
+                "approvals": approvals,
+                "rejections": rejections
+            }
+
+        status, reason, announcement = decision
+        if status == "approved":
+            applied = self._commit_to_context(proposal, squad_id)
+        else:
+            applied = self._resolve_commit(commit_id, status, announcement, squad_id)
 
-    def _commit_to_context(self, proposal: CommitProposal, squad_id: str = "default"):
-        """Write an approved proposal to canonical context."""
-        now = datetime.now(timezone.utc).isoformat()
+        if not applied:
+            # Another vote resolved this commit first; report what it decided
+            current = self.db.get_commit(commit_id)
+            return {"status": current.status if current else status, "reason": "already_resolved"}
+        return {"status": status, "reason": reason}
 
-        entry = ContextEntry(
-            content=proposal.content,
-            committed_by=proposal.proposed_by_name,
-            origin=proposal.origin,
-            commit_id=proposal.id
-        )
-        entry = self.db.add_context_entry(entry, squad_id)
+    def _commit_to_context(self, proposal: CommitProposal, squad_id: str = "default") -> bool:
+        """
+        Write an approved proposal to canonical context.
+        Returns False if the proposal was no longer pending.
+        """
+        now = utc_now_iso()
+
+        # Claim the proposal before writing, so it is committed at most once
+        if not self.db.update_commit_status(proposal.id, "approved", now, expected_status="pending"):
+            return False
+
+        # Built directly in ContextEntry.to_dict() shape; the DB assigns the version
+        entry = self.db.add_context_entry_dict({
+            "id": str(uuid.uuid4())[:8],
+            "content": proposal.content,
+            "committed_at": now,
+            "committed_by": proposal.proposed_by_name,
+            "origin": proposal.origin,
+            "commit_id": proposal.id,
+            "version": 0,
+        }, squad_id)
+        self._ctx_cache.pop(squad_id, None)
 
-        self._resolve_commit(
+        self._announce_resolution(
             proposal.id, "approved",
-            f"Committed to context (v{entry.version}): \"{proposal.content}\"",
+            f"Committed to context (v{entry['version']}): \"{proposal.content}\"",
             squad_id
         )
 
-        self._broadcast("context_updated", entry.to_dict(), squad_id)
+        self._broadcast("context_updated", entry, squad_id)
+        return True
 
     def _resolve_commit(self, commit_id: str, status: str, announcement: str,
-                        squad_id: str = "default"):
-        """Finalize a commit proposal."""
-        now = datetime.now(timezone.utc).isoformat()
-        self.db.update_commit_status(commit_id, status, now)
-
-        sys_msg = Message(
-            sender_id="orchestrator",
-            sender_name="Squad Bot",
-            sender_type="orchestrator",
-            content=announcement
-        )
-        self.db.add_message(sys_msg, squad_id)
-        self._broadcast("new_message", sys_msg.to_dict(), squad_id)
+                        squad_id: str = "default") -> bool:
+        """
+        Finalize a commit proposal.
+        Returns False if it was no longer pending.
+        """
+        now = utc_now_iso()
+        if not self.db.update_commit_status(commit_id, status, now, expected_status="pending"):
+            return False
+        self._announce_resolution(commit_id, status, announcement, squad_id)
+        return True
+
+    def _announce_resolution(self, commit_id: str, status: str, announcement: str,
+                             squad_id: str = "default"):
+        """Post and broadcast the outcome of a commit proposal."""
+        self._emit_system(announcement, squad_id, sender_type="orchestrator")
         self._broadcast("commit_resolved", {"commit_id": commit_id, "status": status}, squad_id)
 
     def get_pending_commits(self, squad_id: str = "default") -> list[dict]:
         """List all pending commit proposals with their vote status."""
-        commits = self.db.get_pending_commits(squad_id)
         result = []
-        for c in commits:
-            votes = self.db.get_votes_for_commit(c.id)
+        for c, votes in self.db.get_pending_commits_with_votes(squad_id):
+            approvals, rejections, abstentions, _ = self._tally_votes(votes)
             result.append({
                 **c.to_dict(),
                 "votes": [v.to_dict() for v in votes],
                 "vote_summary": {
-                    "approvals": sum(1 for v in votes if v.choice == "approve"),
-                    "rejections": sum(1 for v in votes if v.choice == "reject"),
-                    "abstentions": sum(1 for v in votes if v.choice == "abstain"),
+                    "approvals": approvals,
+                    "rejections": rejections,
+                    "abstentions": abstentions,
                     "total": len(votes)
                 }
             })
@@ -1196,7 +1401,7 @@ class Orchestrator:
         """Full squad status snapshot."""
         members = self.db.get_active_members(squad_id)
         context_version = self.db.get_context_version(squad_id)
-        pending = self.db.get_pending_commits(squad_id)
+        pending_count = self.db.count_pending_commits(squad_id)
         squad = self.db.get_squad(squad_id)
 
         return {
@@ -1205,6 +1410,6 @@ class Orchestrator:
             "members": [m.to_dict() for m in members],
             "member_count": len(members),
             "context_version": context_version,
-            "pending_commits": len(pending),
+            "pending_commits": pending_count,
             "consensus_mode": squad.consensus_mode if squad else self.consensus_mode,
         }
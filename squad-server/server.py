@@ -14,10 +14,15 @@ Usage:
 import sys
 import os
 import json
+import logging
+import platform
+import zlib
 import asyncio
 import argparse
+import dataclasses
 from datetime import datetime, timezone
-from typing import Optional, List
+from enum import Enum
+from typing import Callable, Optional, List
 
 # ─── Add parent dir to path for imports ──────────────────────────────────
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -32,657 +37,822 @@ from auth import (
 from webhooks import WebhookManager, generate_webhook_secret
 from oauth import GoogleOAuth
 
+logger = logging.getLogger(__name__)
+
+
+def _json_default(obj):
+    """Encode the model types a result may carry (orjson handles most natively)."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, datetime):
+        # Naive datetimes are UTC, as with orjson's OPT_NAIVE_UTC
+        return (obj if obj.tzinfo else obj.replace(tzinfo=timezone.utc)).isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+# orjson is optional; fall back to the stdlib encoder when it isn't installed.
+# orjson serializes dataclasses, enums, datetimes and UUIDs in C, so the
+# Python default hook only runs for anything more exotic.
+try:
+    import orjson
+
+    _ORJSON_INDENT = orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC
+    _ORJSON_COMPACT = orjson.OPT_NAIVE_UTC
+
+    def encode_json(obj, indent: bool = False) -> str:
+        return orjson.dumps(
+            obj, default=_json_default, option=_ORJSON_INDENT if indent else _ORJSON_COMPACT
+        ).decode()
+
+    def encode_json_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=_json_default, option=_ORJSON_COMPACT)
+
+    decode_json = orjson.loads
+except ImportError:
+    orjson = None
+
+    def encode_json(obj, indent: bool = False) -> str:
+        if indent:
+            return json.dumps(obj, indent=2, default=_json_default)
+        # Compact like orjson; broadcasts send this string to every client
+        return json.dumps(obj, separators=(",", ":"), default=_json_default)
+
+    def encode_json_bytes(obj) -> bytes:
+        return encode_json(obj).encode()
+
+    decode_json = json.loads
+
+# Tool arguments are checked by validators compiled once per schema: with
+# fastjsonschema when installed, else jsonschema (which mcp depends on)
+try:
+    import fastjsonschema
+
+    def compile_validator(schema: dict):
+        """Compile a schema into check(instance) -> first error message or None."""
+        validate = fastjsonschema.compile(schema, use_default=False)
+
+        def check(instance) -> Optional[str]:
+            try:
+                validate(instance)
+            except fastjsonschema.JsonSchemaException as e:
+                return e.message
+            return None
+        return check
+except ImportError:
+    fastjsonschema = None
+    from jsonschema.exceptions import best_match
+    from jsonschema.validators import validator_for
+
+    def compile_validator(schema: dict):
+        """Compile a schema into check(instance) -> first error message or None."""
+        validator = validator_for(schema)(schema)
+
+        def check(instance) -> Optional[str]:
+            error = best_match(validator.iter_errors(instance))
+            return error.message if error else None
+        return check
+
+# uvloop is optional too (and unavailable on Windows); run_async() falls back
+# to the stdlib event loop without it
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# rloop (an io_uring event loop) is opt-in with SQUADBOT_EVENT_LOOP=rloop, and
+# only used on Linux 5.15+, where io_uring's networking ops are complete
+RLOOP_MIN_KERNEL = (5, 15)
+
+
+def _kernel_version() -> tuple:
+    """The running Linux kernel's (major, minor), or (0, 0) if unknown."""
+    parts = platform.release().split(".")
+    try:
+        return int(parts[0]), int(parts[1].split("-")[0])
+    except (IndexError, ValueError):
+        return 0, 0
+
+
+def event_loop_name() -> str:
+    """The event loop run_async() will use: "rloop", "uvloop" or "asyncio"."""
+    if (os.environ.get("SQUADBOT_EVENT_LOOP", "").lower() == "rloop"
+            and sys.platform == "linux" and _kernel_version() >= RLOOP_MIN_KERNEL):
+        try:
+            import rloop  # noqa: F401
+            return "rloop"
+        except ImportError:
+            pass
+    if uvloop is not None and sys.platform != "win32":
+        return "uvloop"
+    return "asyncio"
+
+
+def run_async(main_coro):
+    """Run the server's top-level coroutine, on rloop or uvloop when available."""
+    loop = event_loop_name()
+    if loop == "rloop":
+        import rloop
+        with asyncio.Runner(loop_factory=rloop.new_event_loop) as runner:
+            return runner.run(main_coro)
+    if loop == "uvloop":
+        return uvloop.run(main_coro)
+    return asyncio.run(main_coro)
+
+
+def run_request(db: SquadDatabase, handler: Callable, *args):
+    """
+    Run one tool call or WebSocket action, first dropping any caches another
+    process's writes have made stale. The check costs a PRAGMA, so it is
+    made once here rather than on every cached lookup.
+    """
+    db.revalidate_caches()
+    return handler(*args)
+
+
+# Frames a WebSocket subscriber may fall behind by before it is disconnected
+WS_SEND_QUEUE_SIZE = 256
+# Most queued events a subscriber's writer merges into one batch frame
+WS_BATCH_MAX_EVENTS = 64
+# Frames at least this long go to ?compress=1 subscribers as zlib binary frames
+WS_COMPRESS_MIN_BYTES = 1024
+
 
 # ═══════════════════════════════════════════════════════════════════════════
 # MCP SERVER — Tools that any MCP-compatible AI client can use
 # ═══════════════════════════════════════════════════════════════════════════
 
-def create_mcp_server(orchestrator: Orchestrator):
-    """Create the MCP server with all squad tools."""
+# Schema fragments repeated across many tools; every Tool shares these objects
+_SQUAD_ID_PROP = {"type": "string", "default": "default"}
+_SQUAD_ID_REQUIRED_PROP = {"type": "string"}
+_ADMIN_NAME_PROP = {"type": "string"}
+_FILENAME_PROP = {"type": "string"}
+_FILE_PATH_PROP = {"type": "string", "default": ""}
+
+
+def create_mcp_server(orchestrator: Orchestrator, offload: bool = True):
+    """
+    Create the MCP server with all squad tools.
+    offload runs tool calls on the orchestrator's worker thread; pass False
+    when the server shares the process with the REST/WebSocket app, which
+    calls the orchestrator on the event loop.
+    """
     from mcp.server import Server
     from mcp.types import Tool, TextContent
     import mcp.types as types
 
     server = Server("squad-bot")
 
-    @server.list_tools()
-    async def list_tools() -> list[Tool]:
-        tools = [
-            Tool(
-                name="squad_join",
-                description="Join the squad channel. Call this first before sending messages.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "name": {
-                            "type": "string",
-                            "description": "Your name (the human's name, e.g. 'Saleh', 'Ahmed')"
-                        },
-                        "model": {
-                            "type": "string",
-                            "description": "Which AI model you are (e.g. 'Claude', 'ChatGPT', 'Gemini')",
-                            "default": "unknown"
-                        },
-                        "squad_id": {
-                            "type": "string",
-                            "description": "Squad ID to join (default: 'default')",
-                            "default": "default"
-                        }
+    # Built once: the tool set is static for the lifetime of the server
+    tools = [
+        Tool(
+            name="squad_join",
+            description="Join the squad channel. Call this first before sending messages.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string",
+                        "description": "Your name (the human's name, e.g. 'Saleh', 'Ahmed')"
                     },
-                    "required": ["name"]
-                }
-            ),
-            Tool(
-                name="squad_leave",
-                description="Leave the squad channel.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string", "description": "Your name"},
-                        "squad_id": {"type": "string", "default": "default"}
+                    "model": {
+                        "type": "string",
+                        "description": "Which AI model you are (e.g. 'Claude', 'ChatGPT', 'Gemini')",
+                        "default": "unknown"
                     },
-                    "required": ["name"]
-                }
-            ),
-            Tool(
-                name="squad_members",
-                description="List all current squad members, their AI models, and status.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string", "default": "default"}
+                    "squad_id": {
+                        "type": "string",
+                        "description": "Squad ID to join (default: 'default')",
+                        "default": "default"
                     }
+                },
+                "required": ["name"]
+            }
+        ),
+        Tool(
+            name="squad_leave",
+            description="Leave the squad channel.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "description": "Your name"},
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["name"]
+            }
+        ),
+        Tool(
+            name="squad_members",
+            description="List all current squad members, their AI models, and status.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_PROP
                 }
-            ),
-            Tool(
-                name="squad_send",
-                description="Send a message to the squad channel. All members will see it.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "sender_name": {
-                            "type": "string",
-                            "description": "Your name (must match your join name)"
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The message to send"
-                        },
-                        "sender_type": {
-                            "type": "string",
-                            "enum": ["human", "agent"],
-                            "description": "Whether this message is from the human or their AI agent",
-                            "default": "agent"
-                        },
-                        "reply_to": {
-                            "type": "string",
-                            "description": "Optional: message ID to reply to"
-                        },
-                        "squad_id": {"type": "string", "default": "default"}
+            }
+        ),
+        Tool(
+            name="squad_send",
+            description="Send a message to the squad channel. All members will see it.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "sender_name": {
+                        "type": "string",
+                        "description": "Your name (must match your join name)"
                     },
-                    "required": ["sender_name", "content"]
-                }
-            ),
-            Tool(
-                name="squad_read",
-                description="Read recent messages from the squad channel. Use 'since' to get only new messages.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "since": {
-                            "type": "string",
-                            "description": "ISO timestamp — only get messages after this time"
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max messages to return (default 50)",
-                            "default": 50
-                        },
-                        "squad_id": {"type": "string", "default": "default"}
-                    }
-                }
-            ),
-            Tool(
-                name="squad_context",
-                description="Read the current canonical context — the squad's shared truth. "
-                           "This is what the squad has formally agreed upon.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string", "default": "default"}
-                    }
-                }
-            ),
-            Tool(
-                name="squad_propose_commit",
-                description="Propose something to be added to the canonical context. "
-                           "This starts a voting process. Use when you believe the squad "
-                           "has reached a decision or agreement on something.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "proposer_name": {
-                            "type": "string",
-                            "description": "Your name"
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "What should be committed to context "
-                                          "(e.g. 'We decided to use Python for the backend')"
-                        },
-                        "squad_id": {"type": "string", "default": "default"}
+                    "content": {
+                        "type": "string",
+                        "description": "The message to send"
                     },
-                    "required": ["proposer_name", "content"]
-                }
-            ),
-            Tool(
-                name="squad_vote",
-                description="Vote on a pending commit proposal. "
-                           "Use 'approve' to agree, 'reject' to disagree, 'abstain' to skip.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "voter_name": {
-                            "type": "string",
-                            "description": "Your name"
-                        },
-                        "commit_id": {
-                            "type": "string",
-                            "description": "The commit ID to vote on"
-                        },
-                        "choice": {
-                            "type": "string",
-                            "enum": ["approve", "reject", "abstain"],
-                            "description": "Your vote"
-                        },
-                        "is_human_override": {
-                            "type": "boolean",
-                            "description": "Set to true if the HUMAN (not the agent) is casting this vote. "
-                                          "Human rejections always veto.",
-                            "default": False
-                        },
-                        "squad_id": {"type": "string", "default": "default"}
+                    "sender_type": {
+                        "type": "string",
+                        "enum": ["human", "agent"],
+                        "description": "Whether this message is from the human or their AI agent",
+                        "default": "agent"
                     },
-                    "required": ["voter_name", "commit_id", "choice"]
-                }
-            ),
-            Tool(
-                name="squad_pending_commits",
-                description="List all pending commit proposals and their vote status.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string", "default": "default"}
-                    }
-                }
-            ),
-            Tool(
-                name="squad_status",
-                description="Get full squad status: members, context version, pending items.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string", "default": "default"}
-                    }
-                }
-            ),
-            # ── Admin Tools ──────────────────────────────────────────────────
-            Tool(
-                name="squad_create_invite",
-                description="[ADMIN] Create an invite code for new members to join.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string", "description": "Your name (must be admin)"},
-                        "target_name": {"type": "string", "description": "Optional: name of person invite is for"},
-                        "max_uses": {"type": "integer", "default": 1},
-                        "expires_hours": {"type": "integer", "description": "Hours until expiration"}
+                    "reply_to": {
+                        "type": "string",
+                        "description": "Optional: message ID to reply to"
                     },
-                    "required": ["squad_id", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_list_invites",
-                description="[ADMIN] List all invite codes.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"}
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["sender_name", "content"]
+            }
+        ),
+        Tool(
+            name="squad_read",
+            description="Read recent messages from the squad channel. Use 'since' to get only new messages.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "since": {
+                        "type": "string",
+                        "description": "ISO timestamp — only get messages after this time"
                     },
-                    "required": ["squad_id", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_revoke_invite",
-                description="[ADMIN] Revoke an invite code.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "code": {"type": "string"},
-                        "admin_name": {"type": "string"}
+                    "limit": {
+                        "type": "integer",
+                        "description": "Max messages to return (default 50)",
+                        "default": 50
                     },
-                    "required": ["squad_id", "code", "admin_name"]
+                    "squad_id": _SQUAD_ID_PROP
                 }
-            ),
-            Tool(
-                name="squad_kick_member",
-                description="[ADMIN] Remove a member from the squad.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "member_name": {"type": "string"},
-                        "admin_name": {"type": "string"}
-                    },
-                    "required": ["squad_id", "member_name", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_context",
+            description="Read the current canonical context — the squad's shared truth. "
+                       "This is what the squad has formally agreed upon.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_PROP
                 }
-            ),
-            Tool(
-                name="squad_rotate_key",
-                description="[ADMIN] Generate a new enrollment key for a member, revoking old ones.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "member_name": {"type": "string"},
-                        "admin_name": {"type": "string"}
+            }
+        ),
+        Tool(
+            name="squad_propose_commit",
+            description="Propose something to be added to the canonical context. "
+                       "This starts a voting process. Use when you believe the squad "
+                       "has reached a decision or agreement on something.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "proposer_name": {
+                        "type": "string",
+                        "description": "Your name"
                     },
-                    "required": ["squad_id", "member_name", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_list_sessions",
-                description="[ADMIN] List all active sessions.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"}
+                    "content": {
+                        "type": "string",
+                        "description": "What should be committed to context "
+                                      "(e.g. 'We decided to use Python for the backend')"
                     },
-                    "required": ["squad_id", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_terminate_session",
-                description="[ADMIN] Terminate a specific session.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "session_id": {"type": "string"},
-                        "admin_name": {"type": "string"}
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["proposer_name", "content"]
+            }
+        ),
+        Tool(
+            name="squad_vote",
+            description="Vote on a pending commit proposal. "
+                       "Use 'approve' to agree, 'reject' to disagree, 'abstain' to skip.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "voter_name": {
+                        "type": "string",
+                        "description": "Your name"
                     },
-                    "required": ["squad_id", "session_id", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_audit_log",
-                description="[ADMIN] View security audit log.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"},
-                        "limit": {"type": "integer", "default": 50}
+                    "commit_id": {
+                        "type": "string",
+                        "description": "The commit ID to vote on"
                     },
-                    "required": ["squad_id", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_update_settings",
-                description="[ADMIN] Update squad configuration.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"},
-                        "name": {"type": "string"},
-                        "consensus_mode": {"type": "string", "enum": ["majority", "unanimous", "no_objection"]},
-                        "session_ttl_hours": {"type": "integer"},
-                        "fingerprint_mode": {"type": "string", "enum": ["relaxed", "single_session", "strict"]}
+                    "choice": {
+                        "type": "string",
+                        "enum": ["approve", "reject", "abstain"],
+                        "description": "Your vote"
                     },
-                    "required": ["squad_id", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_register_webhook",
-                description="[ADMIN] Register a webhook for external integrations.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"},
-                        "url": {"type": "string"},
-                        "event_types": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Events to subscribe to: new_message, member_joined, member_left, context_updated, commit_proposed, commit_resolved, vote_cast, or * for all"
-                        }
+                    "is_human_override": {
+                        "type": "boolean",
+                        "description": "Set to true if the HUMAN (not the agent) is casting this vote. "
+                                      "Human rejections always veto.",
+                        "default": False
                     },
-                    "required": ["squad_id", "admin_name", "url", "event_types"]
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["voter_name", "commit_id", "choice"]
+            }
+        ),
+        Tool(
+            name="squad_pending_commits",
+            description="List all pending commit proposals and their vote status.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_PROP
                 }
-            ),
-            Tool(
-                name="squad_list_webhooks",
-                description="[ADMIN] List registered webhooks.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"}
-                    },
-                    "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_status",
+            description="Get full squad status: members, context version, pending items.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_PROP
                 }
-            ),
-            Tool(
-                name="squad_delete_webhook",
-                description="[ADMIN] Delete a webhook.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string"},
-                        "admin_name": {"type": "string"},
-                        "webhook_id": {"type": "string"}
+            }
+        ),
+        # ── Admin Tools ──────────────────────────────────────────────────
+        Tool(
+            name="squad_create_invite",
+            description="[ADMIN] Create an invite code for new members to join.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": {"type": "string", "description": "Your name (must be admin)"},
+                    "target_name": {"type": "string", "description": "Optional: name of person invite is for"},
+                    "max_uses": {"type": "integer", "default": 1},
+                    "expires_hours": {"type": "integer", "description": "Hours until expiration"}
+                },
+                "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_list_invites",
+            description="[ADMIN] List all invite codes.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_revoke_invite",
+            description="[ADMIN] Revoke an invite code.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "code": {"type": "string"},
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "code", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_kick_member",
+            description="[ADMIN] Remove a member from the squad.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "member_name": {"type": "string"},
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "member_name", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_rotate_key",
+            description="[ADMIN] Generate a new enrollment key for a member, revoking old ones.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "member_name": {"type": "string"},
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "member_name", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_list_sessions",
+            description="[ADMIN] List all active sessions.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_terminate_session",
+            description="[ADMIN] Terminate a specific session.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "session_id": {"type": "string"},
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "session_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_audit_log",
+            description="[ADMIN] View security audit log.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP,
+                    "limit": {"type": "integer", "default": 50}
+                },
+                "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_update_settings",
+            description="[ADMIN] Update squad configuration.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP,
+                    "name": {"type": "string"},
+                    "consensus_mode": {"type": "string", "enum": ["majority", "unanimous", "no_objection"]},
+                    "session_ttl_hours": {"type": "integer"},
+                    "fingerprint_mode": {"type": "string", "enum": ["relaxed", "single_session", "strict"]}
+                },
+                "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_register_webhook",
+            description="[ADMIN] Register a webhook for external integrations.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP,
+                    "url": {"type": "string"},
+                    "event_types": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Events to subscribe to: new_message, member_joined, member_left, context_updated, commit_proposed, commit_resolved, vote_cast, or * for all"
+                    }
+                },
+                "required": ["squad_id", "admin_name", "url", "event_types"]
+            }
+        ),
+        Tool(
+            name="squad_list_webhooks",
+            description="[ADMIN] List registered webhooks.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP
+                },
+                "required": ["squad_id", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_delete_webhook",
+            description="[ADMIN] Delete a webhook.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_REQUIRED_PROP,
+                    "admin_name": _ADMIN_NAME_PROP,
+                    "webhook_id": {"type": "string"}
+                },
+                "required": ["squad_id", "admin_name", "webhook_id"]
+            }
+        ),
+        # ── File Tools ───────────────────────────────────────────────────
+        Tool(
+            name="squad_files_list",
+            description="List all shared files in this squad. Returns filenames, sizes, who uploaded them, and when.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "squad_id": _SQUAD_ID_PROP,
+                    "path": {
+                        "type": "string",
+                        "description": "Optional subfolder filter, e.g. 'docs/'"
                     },
-                    "required": ["squad_id", "admin_name", "webhook_id"]
-                }
-            ),
-            # ── File Tools ───────────────────────────────────────────────────
-            Tool(
-                name="squad_files_list",
-                description="List all shared files in this squad. Returns filenames, sizes, who uploaded them, and when.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "squad_id": {"type": "string", "default": "default"},
-                        "path": {
-                            "type": "string",
-                            "description": "Optional subfolder filter, e.g. 'docs/'"
-                        },
-                        "sort_by": {
-                            "type": "string",
-                            "enum": ["name", "date", "size"],
-                            "description": "Sort order (default: date)",
-                            "default": "date"
-                        }
+                    "sort_by": {
+                        "type": "string",
+                        "enum": ["name", "date", "size"],
+                        "description": "Sort order (default: date)",
+                        "default": "date"
                     }
                 }
-            ),
-            Tool(
-                name="squad_files_read",
-                description="Read a shared file from the squad. For text files, returns the content as text. "
-                           "For images and other binary files, returns base64-encoded content.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "filename": {
-                            "type": "string",
-                            "description": "The filename to read, e.g. 'project-plan.md'"
-                        },
-                        "path": {
-                            "type": "string",
-                            "description": "Optional subfolder path, e.g. 'docs/'",
-                            "default": ""
-                        },
-                        "version": {
-                            "type": "integer",
-                            "description": "Optional specific version. Default: latest"
-                        },
-                        "squad_id": {"type": "string", "default": "default"}
+            }
+        ),
+        Tool(
+            name="squad_files_read",
+            description="Read a shared file from the squad. For text files, returns the content as text. "
+                       "For images and other binary files, returns base64-encoded content.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "filename": {
+                        "type": "string",
+                        "description": "The filename to read, e.g. 'project-plan.md'"
                     },
-                    "required": ["filename"]
-                }
-            ),
-            Tool(
-                name="squad_files_write",
-                description="Upload or update a shared file in the squad. If a file with this name already exists, "
-                           "a new version is created (old versions are kept). For text files, pass content directly. "
-                           "For images/binary, pass base64-encoded content. Max file size: 10 MB.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "filename": {
-                            "type": "string",
-                            "description": "The filename, e.g. 'meeting-notes.md'"
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The content (text or base64-encoded binary)"
-                        },
-                        "sender_name": {
-                            "type": "string",
-                            "description": "Your name (must be a squad member)"
-                        },
-                        "encoding": {
-                            "type": "string",
-                            "enum": ["text", "base64", "auto"],
-                            "description": "Content encoding. 'auto' detects from mime type.",
-                            "default": "auto"
-                        },
-                        "path": {
-                            "type": "string",
-                            "description": "Optional subfolder, e.g. 'docs/'",
-                            "default": ""
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Optional file description"
-                        },
-                        "change_note": {
-                            "type": "string",
-                            "description": "Optional note about what changed (for updates)"
-                        },
-                        "mime_type": {
-                            "type": "string",
-                            "description": "Optional MIME type (auto-detected from extension if not provided)"
-                        },
-                        "squad_id": {"type": "string", "default": "default"}
+                    "path": {
+                        "type": "string",
+                        "description": "Optional subfolder path, e.g. 'docs/'",
+                        "default": ""
                     },
-                    "required": ["filename", "content", "sender_name"]
-                }
-            ),
-            Tool(
-                name="squad_files_delete",
-                description="[ADMIN] Delete a shared file from the squad. The file is hidden from listings but preserved internally.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "filename": {"type": "string"},
-                        "path": {"type": "string", "default": ""},
-                        "admin_name": {"type": "string"},
-                        "squad_id": {"type": "string", "default": "default"}
+                    "version": {
+                        "type": "integer",
+                        "description": "Optional specific version. Default: latest"
                     },
-                    "required": ["filename", "admin_name"]
-                }
-            ),
-            Tool(
-                name="squad_files_info",
-                description="Get information about a shared file without downloading it. Shows size, type, version count, who uploaded it, description.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "filename": {"type": "string"},
-                        "path": {"type": "string", "default": ""},
-                        "squad_id": {"type": "string", "default": "default"}
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["filename"]
+            }
+        ),
+        Tool(
+            name="squad_files_write",
+            description="Upload or update a shared file in the squad. If a file with this name already exists, "
+                       "a new version is created (old versions are kept). For text files, pass content directly. "
+                       "For images/binary, pass base64-encoded content. Max file size: 10 MB.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "filename": {
+                        "type": "string",
+                        "description": "The filename, e.g. 'meeting-notes.md'"
                     },
-                    "required": ["filename"]
-                }
-            ),
-            Tool(
-                name="squad_files_versions",
-                description="View the version history of a shared file. Shows who uploaded each version and when.",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "filename": {"type": "string"},
-                        "path": {"type": "string", "default": ""},
-                        "squad_id": {"type": "string", "default": "default"}
+                    "content": {
+                        "type": "string",
+                        "description": "The content (text or base64-encoded binary)"
                     },
-                    "required": ["filename"]
-                }
-            ),
-        ]
+                    "sender_name": {
+                        "type": "string",
+                        "description": "Your name (must be a squad member)"
+                    },
+                    "encoding": {
+                        "type": "string",
+                        "enum": ["text", "base64", "auto"],
+                        "description": "Content encoding. 'auto' detects from mime type.",
+                        "default": "auto"
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "Optional subfolder, e.g. 'docs/'",
+                        "default": ""
+                    },
+                    "description": {
+                        "type": "string",
+                        "description": "Optional file description"
+                    },
+                    "change_note": {
+                        "type": "string",
+                        "description": "Optional note about what changed (for updates)"
+                    },
+                    "mime_type": {
+                        "type": "string",
+                        "description": "Optional MIME type (auto-detected from extension if not provided)"
+                    },
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["filename", "content", "sender_name"]
+            }
+        ),
+        Tool(
+            name="squad_files_delete",
+            description="[ADMIN] Delete a shared file from the squad. The file is hidden from listings but preserved internally.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "filename": _FILENAME_PROP,
+                    "path": _FILE_PATH_PROP,
+                    "admin_name": _ADMIN_NAME_PROP,
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["filename", "admin_name"]
+            }
+        ),
+        Tool(
+            name="squad_files_info",
+            description="Get information about a shared file without downloading it. Shows size, type, version count, who uploaded it, description.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "filename": _FILENAME_PROP,
+                    "path": _FILE_PATH_PROP,
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["filename"]
+            }
+        ),
+        Tool(
+            name="squad_files_versions",
+            description="View the version history of a shared file. Shows who uploaded each version and when.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "filename": _FILENAME_PROP,
+                    "path": _FILE_PATH_PROP,
+                    "squad_id": _SQUAD_ID_PROP
+                },
+                "required": ["filename"]
+            }
+        ),
+    ]
+
+    @server.list_tools()
+    async def list_tools() -> list[Tool]:
         return tools
 
-    @server.call_tool()
+    # ── Tool handlers: (arguments, squad_id) -> result ───────────────────
+
+    get_member_by_name = orchestrator.db.get_member_by_name
+
+    def admin_id(arguments: dict, squad_id: str) -> str:
+        """
+        Resolve admin_name to a member id; "" lets the orchestrator reject it.
+        The lookup is a hit on the database's cached squad roster.
+        """
+        admin = get_member_by_name(arguments["admin_name"], squad_id)
+        return admin.id if admin else ""
+
+    def create_invite(arguments: dict, squad_id: str) -> dict:
+        admin = admin_id(arguments, squad_id)
+        if not admin:
+            return {"error": "Admin not found in squad"}
+        return orchestrator.create_invite(
+            squad_id, admin,
+            target_name=arguments.get("target_name"),
+            max_uses=arguments.get("max_uses", 1),
+            expires_hours=arguments.get("expires_hours")
+        )
+
+    def update_settings(arguments: dict, squad_id: str) -> dict:
+        settings = {k: v for k, v in arguments.items() if k not in ("squad_id", "admin_name")}
+        return orchestrator.update_squad_settings(squad_id, admin_id(arguments, squad_id), **settings)
+
+    def register_webhook(arguments: dict, squad_id: str) -> dict:
+        admin = admin_id(arguments, squad_id)
+        # No secret is minted for a name that isn't even a member
+        secret = generate_webhook_secret() if admin else ""
+        result = orchestrator.register_webhook(
+            squad_id, arguments["url"], secret, arguments["event_types"], admin
+        )
+        if result.get("success"):
+            result["secret"] = secret  # Return secret only on creation
+        return result
+
+    def files_write(arguments: dict, squad_id: str) -> dict:
+        sender_name = arguments["sender_name"]
+        member = get_member_by_name(sender_name, squad_id)
+        if not member:
+            return {"success": False, "error": f"'{sender_name}' is not in the squad"}
+        return orchestrator.write_file(
+            squad_id=squad_id,
+            member_id=member.id,
+            member_name=member.name,
+            filename=arguments["filename"],
+            content=arguments["content"],
+            path=arguments.get("path", ""),
+            mime_type=arguments.get("mime_type"),
+            encoding=arguments.get("encoding", "auto"),
+            description=arguments.get("description"),
+            change_note=arguments.get("change_note")
+        )
+
+    handlers = {
+        "squad_join": lambda a, sid: orchestrator.join(a["name"], a.get("model", "unknown"), sid),
+        "squad_leave": lambda a, sid: orchestrator.leave(a["name"], sid),
+        "squad_members": lambda a, sid: orchestrator.get_members(sid),
+        "squad_send": lambda a, sid: orchestrator.send_message(
+            sender_name=a["sender_name"],
+            content=a["content"],
+            sender_type=a.get("sender_type", "agent"),
+            reply_to=a.get("reply_to"),
+            squad_id=sid
+        ),
+        "squad_read": lambda a, sid: orchestrator.read_messages(
+            since=a.get("since"),
+            limit=a.get("limit", 50),
+            squad_id=sid
+        ),
+        "squad_context": lambda a, sid: orchestrator.get_context(sid),
+        "squad_propose_commit": lambda a, sid: orchestrator.propose_commit(
+            proposer_name=a["proposer_name"],
+            content=a["content"],
+            squad_id=sid
+        ),
+        "squad_vote": lambda a, sid: orchestrator.vote(
+            voter_name=a["voter_name"],
+            commit_id=a["commit_id"],
+            choice=a["choice"],
+            is_human_override=a.get("is_human_override", False),
+            squad_id=sid
+        ),
+        "squad_pending_commits": lambda a, sid: orchestrator.get_pending_commits(sid),
+        "squad_status": lambda a, sid: orchestrator.get_status(sid),
+
+        # Admin tools - admin_id() resolves admin_name to a member id
+        "squad_create_invite": create_invite,
+        "squad_list_invites": lambda a, sid: orchestrator.list_invites(sid, admin_id(a, sid)),
+        "squad_revoke_invite": lambda a, sid: orchestrator.revoke_invite(sid, a["code"], admin_id(a, sid)),
+        "squad_kick_member": lambda a, sid: orchestrator.kick_member(sid, a["member_name"], admin_id(a, sid)),
+        "squad_rotate_key": lambda a, sid: orchestrator.rotate_member_key(sid, a["member_name"], admin_id(a, sid)),
+        "squad_list_sessions": lambda a, sid: orchestrator.list_sessions(sid, admin_id(a, sid)),
+        "squad_terminate_session": lambda a, sid: orchestrator.terminate_session(
+            sid, a["session_id"], admin_id(a, sid)
+        ),
+        "squad_audit_log": lambda a, sid: orchestrator.get_audit_log(sid, admin_id(a, sid), a.get("limit", 50)),
+        "squad_update_settings": update_settings,
+        "squad_register_webhook": register_webhook,
+        "squad_list_webhooks": lambda a, sid: orchestrator.list_webhooks(sid, admin_id(a, sid)),
+        "squad_delete_webhook": lambda a, sid: orchestrator.delete_webhook(sid, a["webhook_id"], admin_id(a, sid)),
+
+        # File tools
+        "squad_files_list": lambda a, sid: orchestrator.list_files(
+            squad_id=sid,
+            path=a.get("path"),
+            sort_by=a.get("sort_by", "date")
+        ),
+        "squad_files_read": lambda a, sid: orchestrator.read_file(
+            squad_id=sid,
+            filename=a["filename"],
+            path=a.get("path", ""),
+            version=a.get("version")
+        ),
+        "squad_files_write": files_write,
+        "squad_files_delete": lambda a, sid: orchestrator.delete_file(
+            squad_id=sid,
+            admin_id=admin_id(a, sid),
+            filename=a["filename"],
+            path=a.get("path", "")
+        ),
+        "squad_files_info": lambda a, sid: orchestrator.get_file_info(
+            squad_id=sid,
+            filename=a["filename"],
+            path=a.get("path", "")
+        ),
+        "squad_files_versions": lambda a, sid: orchestrator.get_file_versions(
+            squad_id=sid,
+            filename=a["filename"],
+            path=a.get("path", "")
+        ),
+    }
+
+    validators = {tool.name: compile_validator(tool.inputSchema) for tool in tools}
+
+    # Arguments are checked against the precompiled validators below; newer
+    # SDKs would otherwise re-validate every call with jsonschema.validate()
+    try:
+        register_call_tool = server.call_tool(validate_input=False)
+    except TypeError:
+        register_call_tool = server.call_tool()
+
+    @register_call_tool
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         try:
-            squad_id = arguments.get("squad_id", "default")
-
-            if name == "squad_join":
-                result = orchestrator.join(arguments["name"], arguments.get("model", "unknown"), squad_id)
-            elif name == "squad_leave":
-                result = orchestrator.leave(arguments["name"], squad_id)
-            elif name == "squad_members":
-                result = orchestrator.get_members(squad_id)
-            elif name == "squad_send":
-                result = orchestrator.send_message(
-                    sender_name=arguments["sender_name"],
-                    content=arguments["content"],
-                    sender_type=arguments.get("sender_type", "agent"),
-                    reply_to=arguments.get("reply_to"),
-                    squad_id=squad_id
-                )
-            elif name == "squad_read":
-                result = orchestrator.read_messages(
-                    since=arguments.get("since"),
-                    limit=arguments.get("limit", 50),
-                    squad_id=squad_id
-                )
-            elif name == "squad_context":
-                result = orchestrator.get_context(squad_id)
-            elif name == "squad_propose_commit":
-                result = orchestrator.propose_commit(
-                    proposer_name=arguments["proposer_name"],
-                    content=arguments["content"],
-                    squad_id=squad_id
-                )
-            elif name == "squad_vote":
-                result = orchestrator.vote(
-                    voter_name=arguments["voter_name"],
-                    commit_id=arguments["commit_id"],
-                    choice=arguments["choice"],
-                    is_human_override=arguments.get("is_human_override", False),
-                    squad_id=squad_id
-                )
-            elif name == "squad_pending_commits":
-                result = orchestrator.get_pending_commits(squad_id)
-            elif name == "squad_status":
-                result = orchestrator.get_status(squad_id)
-
-            # Admin tools - need to get admin_id from name
-            elif name == "squad_create_invite":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                if not admin:
-                    result = {"error": "Admin not found in squad"}
-                else:
-                    result = orchestrator.create_invite(
-                        squad_id, admin.id,
-                        target_name=arguments.get("target_name"),
-                        max_uses=arguments.get("max_uses", 1),
-                        expires_hours=arguments.get("expires_hours")
-                    )
-            elif name == "squad_list_invites":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.list_invites(squad_id, admin.id if admin else "")
-            elif name == "squad_revoke_invite":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.revoke_invite(squad_id, arguments["code"], admin.id if admin else "")
-            elif name == "squad_kick_member":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.kick_member(squad_id, arguments["member_name"], admin.id if admin else "")
-            elif name == "squad_rotate_key":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.rotate_member_key(squad_id, arguments["member_name"], admin.id if admin else "")
-            elif name == "squad_list_sessions":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.list_sessions(squad_id, admin.id if admin else "")
-            elif name == "squad_terminate_session":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.terminate_session(squad_id, arguments["session_id"], admin.id if admin else "")
-            elif name == "squad_audit_log":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.get_audit_log(squad_id, admin.id if admin else "", arguments.get("limit", 50))
-            elif name == "squad_update_settings":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                settings = {k: v for k, v in arguments.items() if k not in ("squad_id", "admin_name")}
-                result = orchestrator.update_squad_settings(squad_id, admin.id if admin else "", **settings)
-            elif name == "squad_register_webhook":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                secret = generate_webhook_secret()
-                result = orchestrator.register_webhook(
-                    squad_id, arguments["url"], secret,
-                    arguments["event_types"], admin.id if admin else ""
-                )
-                if result.get("success"):
-                    result["secret"] = secret  # Return secret only on creation
-            elif name == "squad_list_webhooks":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.list_webhooks(squad_id, admin.id if admin else "")
-            elif name == "squad_delete_webhook":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.delete_webhook(squad_id, arguments["webhook_id"], admin.id if admin else "")
-
-            # File tools
-            elif name == "squad_files_list":
-                result = orchestrator.list_files(
-                    squad_id=squad_id,
-                    path=arguments.get("path"),
-                    sort_by=arguments.get("sort_by", "date")
-                )
-            elif name == "squad_files_read":
-                result = orchestrator.read_file(
-                    squad_id=squad_id,
-                    filename=arguments["filename"],
-                    path=arguments.get("path", ""),
-                    version=arguments.get("version")
-                )
-            elif name == "squad_files_write":
-                member = orchestrator.db.get_member_by_name(arguments["sender_name"], squad_id)
-                if not member:
-                    result = {"success": False, "error": f"'{arguments['sender_name']}' is not in the squad"}
-                else:
-                    result = orchestrator.write_file(
-                        squad_id=squad_id,
-                        member_id=member.id,
-                        member_name=member.name,
-                        filename=arguments["filename"],
-                        content=arguments["content"],
-                        path=arguments.get("path", ""),
-                        mime_type=arguments.get("mime_type"),
-                        encoding=arguments.get("encoding", "auto"),
-                        description=arguments.get("description"),
-                        change_note=arguments.get("change_note")
-                    )
-            elif name == "squad_files_delete":
-                admin = orchestrator.db.get_member_by_name(arguments["admin_name"], squad_id)
-                result = orchestrator.delete_file(
-                    squad_id=squad_id,
-                    admin_id=admin.id if admin else "",
-                    filename=arguments["filename"],
-                    path=arguments.get("path", "")
-                )
-            elif name == "squad_files_info":
-                result = orchestrator.get_file_info(
-                    squad_id=squad_id,
-                    filename=arguments["filename"],
-                    path=arguments.get("path", "")
-                )
-            elif name == "squad_files_versions":
-                result = orchestrator.get_file_versions(
-                    squad_id=squad_id,
-                    filename=arguments["filename"],
-                    path=arguments.get("path", "")
+            handler = handlers.get(name)
+            if handler is None:
+                result = {"error": f"Unknown tool: {name}"}
+            elif (error := validators[name](arguments)) is not None:
+                result = {"error": f"Invalid arguments: {error}"}
+            elif offload:
+                # Off the event loop, so stdio I/O keeps flowing during DB work;
+                # every orchestrator call in this process goes through the worker
+                result = await orchestrator.run_in_worker(
+                    run_request, orchestrator.db, handler, arguments, arguments.get("squad_id", "default")
                 )
             else:
-                result = {"error": f"Unknown tool: {name}"}
-
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+                result = run_request(orchestrator.db, handler, arguments, arguments.get("squad_id", "default"))
+            return [TextContent(type="text", text=encode_json(result, indent=True))]
         except Exception as e:
-            return [TextContent(type="text", text=json.dumps({"error": str(e)}))]
+            return [TextContent(type="text", text=encode_json({"error": str(e)}))]
 
     return server
 
@@ -695,22 +865,50 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
                       webhook_manager: WebhookManager,
                       host: str = "0.0.0.0", port: int = 8080):
     """Create FastAPI server with REST endpoints and WebSocket support."""
-    from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Depends, HTTPException
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response, Depends, HTTPException
     from fastapi.staticfiles import StaticFiles
     from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
     from fastapi.middleware.cors import CORSMiddleware
     from pydantic import BaseModel
     import uvicorn
 
-    app = FastAPI(title="Squad Bot", version="2.0.0")
+    class EncodedJSONResponse(JSONResponse):
+        """JSONResponse rendered by encode_json_bytes() (orjson when installed)."""
+
+        def render(self, content) -> bytes:
+            return encode_json_bytes(content)
+
+    app = FastAPI(title="Squad Bot", version="2.0.0", default_response_class=EncodedJSONResponse)
+
+    # SQUADBOT_CORS_ORIGINS is a comma-separated whitelist ("*" allows any
+    # origin). Unset, no cross-origin requests are allowed; the web UI is
+    # served from this same origin. Credentials are only allowed for an
+    # explicit list of origins, never with "*". Preflight results are cached
+    # by browsers for a day.
+    cors_origins = [o.strip() for o in os.environ.get("SQUADBOT_CORS_ORIGINS", "").split(",") if o.strip()]
+    if cors_origins:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=cors_origins,
+            allow_credentials="*" not in cors_origins,
+            allow_methods=["GET", "POST", "PATCH", "DELETE"],
+            allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+            expose_headers=["ETag", "X-Next-Cursor"],
+            max_age=86400,
+        )
 
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+    class RevalidateCachesMiddleware:
+        """Drop caches made stale by other processes once per HTTP request."""
+
+        def __init__(self, app):
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
+            if scope["type"] == "http":
+                db.revalidate_caches()
+            await self.app(scope, receive, send)
+
+    app.add_middleware(RevalidateCachesMiddleware)
 
     # Initialize auth
     init_auth(db)
@@ -752,44 +950,146 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
         mime_type: Optional[str] = None
 
     # ── WebSocket connections ────────────────────────────────────────────
-    connected_clients: dict[str, list[WebSocket]] = {}  # squad_id -> clients
-
-    async def broadcast_event(event: dict):
-        """Send events to all connected WebSocket clients for the squad."""
+    # squad_id -> {client: its queue of pending frames}
+    connected_clients: dict[str, dict[WebSocket, asyncio.Queue]] = {}
+    compressing_clients: set[WebSocket] = set()  # connected with ?compress=1
+
+    def drop_client(ws: WebSocket, squad_id: str):
+        """Forget a client and its send queue."""
+        clients = connected_clients.get(squad_id)
+        if clients is not None:
+            clients.pop(ws, None)
+        compressing_clients.discard(ws)
+
+    async def send_texts(ws: WebSocket, texts: list[str]):
+        """Send encoded events, several at once as a single batch frame."""
+        if len(texts) == 1:
+            await ws.send_text(texts[0])
+        else:
+            # Payloads are already encoded; splice them rather than re-encode
+            await ws.send_text('{"type":"batch","events":[' + ",".join(texts) + "]}")
+
+    async def client_writer(ws: WebSocket, squad_id: str, queue: asyncio.Queue):
+        """
+        Drain one client's queue, so a slow socket only delays itself. Text
+        events that piled up during the previous send go out together as one
+        {"type": "batch", "events": [...]} frame; compressed (bytes) events
+        are sent as they are, in order.
+        """
+        try:
+            while True:
+                items = [await queue.get()]
+                while not queue.empty() and len(items) < WS_BATCH_MAX_EVENTS:
+                    items.append(queue.get_nowait())
+                texts = []
+                for item in items:
+                    if isinstance(item, bytes):
+                        if texts:
+                            await send_texts(ws, texts)
+                            texts = []
+                        await ws.send_bytes(item)
+                    else:
+                        texts.append(item)
+                if texts:
+                    await send_texts(ws, texts)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            drop_client(ws, squad_id)
+
+    def broadcast_event(event: dict):
+        """Queue an event for every connected WebSocket client in the squad."""
         squad_id = event.get("squad_id", "default")
-        clients = connected_clients.get(squad_id, [])
-        disconnected = []
-        for client in clients:
+        clients = connected_clients.get(squad_id)
+        if not clients:
+            return
+        # Serialize, and compress if anyone needs it, once for every subscriber
+        payload = encode_json(event)
+        compress = len(payload) >= WS_COMPRESS_MIN_BYTES
+        compressed = None
+        overflowed = None
+        for client, queue in clients.items():
+            frame = payload
+            if compress and client in compressing_clients:
+                if compressed is None:
+                    compressed = zlib.compress(payload.encode())
+                frame = compressed
             try:
-                await client.send_json(event)
-            except Exception:
-                disconnected.append(client)
-        for client in disconnected:
-            clients.remove(client)
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                if overflowed is None:
+                    overflowed = []
+                overflowed.append(client)
+        if overflowed:
+            # Too far behind to catch up; close so the UI reconnects and
+            # reloads initial_state
+            for client in overflowed:
+                drop_client(client, squad_id)
+                asyncio.ensure_future(client.close(code=1013))
+
+    # The loop serving WebSocket clients, captured when the first one connects
+    ws_loop: list[Optional[asyncio.AbstractEventLoop]] = [None]
 
     # Register orchestrator events to broadcast via WebSocket
     def on_orchestrator_event(event: dict):
-        """Bridge sync orchestrator events to async WebSocket broadcasts."""
+        """
+        Bridge sync orchestrator events to the WebSocket send queues. Events
+        fired on the loop are queued directly; from any other thread (e.g. the
+        orchestrator's worker) they are handed to the loop thread-safely.
+        """
+        loop = ws_loop[0]
+        if loop is None:
+            return  # No client has ever connected, so nobody to tell
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
         try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.create_task(broadcast_event(event))
+            if running is loop:
+                broadcast_event(event)
             else:
-                loop.run_until_complete(broadcast_event(event))
+                loop.call_soon_threadsafe(broadcast_event, event)
         except RuntimeError:
-            pass
+            pass  # Loop closed during shutdown
 
     orchestrator.register_listener(on_orchestrator_event)
 
+    # Actions a WebSocket client may send: {"action": ..., ...} -> handler(msg, squad_id)
+    ws_actions = {
+        "send_message": lambda msg, sid: orchestrator.send_message(
+            sender_name=msg["sender_name"],
+            content=msg["content"],
+            sender_type=msg.get("sender_type", "human"),
+            squad_id=sid
+        ),
+        "propose_commit": lambda msg, sid: orchestrator.propose_commit(
+            proposer_name=msg["proposer_name"],
+            content=msg["content"],
+            squad_id=sid
+        ),
+        "vote": lambda msg, sid: orchestrator.vote(
+            voter_name=msg["voter_name"],
+            commit_id=msg["commit_id"],
+            choice=msg["choice"],
+            is_human_override=msg.get("is_human_override", True),
+            squad_id=sid
+        ),
+    }
+
     @app.websocket("/ws")
-    async def websocket_endpoint(ws: WebSocket, squad_id: str = "default"):
+    async def websocket_endpoint(ws: WebSocket, squad_id: str = "default", compress: bool = False):
         await ws.accept()
-        if squad_id not in connected_clients:
-            connected_clients[squad_id] = []
-        connected_clients[squad_id].append(ws)
+        ws_loop[0] = asyncio.get_running_loop()
+        # Register before sending initial_state so no event is missed; frames
+        # queue up until the writer starts
+        queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        if compress:
+            compressing_clients.add(ws)
+        connected_clients.setdefault(squad_id, {})[ws] = queue
+        writer = None
         try:
             # Send current state on connect
-            await ws.send_json({
+            initial_state = encode_json({
                 "type": "initial_state",
                 "squad_id": squad_id,
                 "data": {
@@ -800,40 +1100,37 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
                     "auth_required": AUTH_REQUIRED,
                 }
             })
+            if compress and len(initial_state) >= WS_COMPRESS_MIN_BYTES:
+                await ws.send_bytes(zlib.compress(initial_state.encode()))
+            else:
+                await ws.send_text(initial_state)
+            writer = asyncio.create_task(client_writer(ws, squad_id, queue))
             # Keep connection alive and handle incoming messages
             while True:
                 data = await ws.receive_text()
                 try:
-                    msg = json.loads(data)
-                    action = msg.get("action")
-                    msg_squad_id = msg.get("squad_id", squad_id)
-
-                    if action == "send_message":
-                        orchestrator.send_message(
-                            sender_name=msg["sender_name"],
-                            content=msg["content"],
-                            sender_type=msg.get("sender_type", "human"),
-                            squad_id=msg_squad_id
-                        )
-                    elif action == "propose_commit":
-                        orchestrator.propose_commit(
-                            proposer_name=msg["proposer_name"],
-                            content=msg["content"],
-                            squad_id=msg_squad_id
-                        )
-                    elif action == "vote":
-                        orchestrator.vote(
-                            voter_name=msg["voter_name"],
-                            commit_id=msg["commit_id"],
-                            choice=msg["choice"],
-                            is_human_override=msg.get("is_human_override", True),
-                            squad_id=msg_squad_id
-                        )
-                except (json.JSONDecodeError, KeyError) as e:
-                    await ws.send_json({"type": "error", "data": {"message": str(e)}})
+                    msg = decode_json(data)
+                    if not isinstance(msg, dict):
+                        raise ValueError("Expected a JSON object")
+                    action = ws_actions.get(msg.get("action"))
+                    if action:
+                        # On the orchestrator's worker, so the loop keeps serving
+                        # other clients while the action writes
+                        await orchestrator.run_in_worker(run_request, db, action, msg, msg.get("squad_id", squad_id))
+                except Exception as e:
+                    logger.warning(f"WebSocket action failed: {e!r}")
+                    # Through the queue, so it can't interleave with the writer's sends
+                    error = encode_json({"type": "error", "data": {"message": str(e)}})
+                    try:
+                        queue.put_nowait(error)
+                    except asyncio.QueueFull:
+                        pass
         except WebSocketDisconnect:
-            if squad_id in connected_clients and ws in connected_clients[squad_id]:
-                connected_clients[squad_id].remove(ws)
+            pass
+        finally:
+            drop_client(ws, squad_id)
+            if writer:
+                writer.cancel()
 
     # ══════════════════════════════════════════════════════════════════════
     # AUTH ENDPOINTS (Public)
@@ -1023,29 +1320,52 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
     # REST Endpoints (Squad-scoped)
     # ══════════════════════════════════════════════════════════════════════
 
+    # The web UI is a single file; locate it once rather than on every visit
+    index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "squad-web", "index.html")
+    if not os.path.isfile(index_path):
+        index_path = None
+
     @app.get("/")
     async def index():
         """Serve the web UI."""
-        web_dir = os.path.join(os.path.dirname(__file__), "..", "squad-web")
-        index_path = os.path.join(web_dir, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
+        if index_path:
+            return FileResponse(index_path, media_type="text/html")
         return HTMLResponse("<h1>Squad Bot</h1><p>Web UI not found. Place index.html in squad-web/</p>")
 
+    # The chat endpoints below take plain JSON objects. They are decoded
+    # directly rather than through a model, since they are the busiest POSTs.
+    async def json_body(request: Request, *required: str) -> dict:
+        """Decode a JSON object request body; 400 if invalid or missing a required field."""
+        try:
+            data = decode_json(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=400, detail="Expected a JSON object")
+        missing = [key for key in required if key not in data]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing field(s): {', '.join(missing)}")
+        return data
+
     @app.post("/api/join")
-    async def api_join(data: dict, squad_id: str = "default"):
+    async def api_join(request: Request, squad_id: str = "default"):
+        data = await json_body(request, "name")
         return orchestrator.join(data["name"], data.get("model", "web"), squad_id)
 
     @app.post("/api/leave")
-    async def api_leave(data: dict, squad_id: str = "default"):
+    async def api_leave(request: Request, squad_id: str = "default"):
+        data = await json_body(request, "name")
         return orchestrator.leave(data["name"], squad_id)
 
+    # The read endpoints below return plain JSON-ready dicts and lists, so they
+    # are wrapped in a response directly, skipping FastAPI's jsonable_encoder pass
     @app.get("/api/members")
     async def api_members(squad_id: str = "default"):
-        return orchestrator.get_members(squad_id)
+        return EncodedJSONResponse(orchestrator.get_members(squad_id))
 
     @app.post("/api/send")
-    async def api_send(data: dict, squad_id: str = "default"):
+    async def api_send(request: Request, squad_id: str = "default"):
+        data = await json_body(request, "sender_name", "content")
         return orchestrator.send_message(
             sender_name=data["sender_name"],
             content=data["content"],
@@ -1056,14 +1376,18 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
 
     @app.get("/api/messages")
     async def api_messages(squad_id: str = "default", since: Optional[str] = None, limit: int = 50):
-        return orchestrator.read_messages(since=since, limit=limit, squad_id=squad_id)
+        messages = orchestrator.read_messages(since=since, limit=limit, squad_id=squad_id)
+        # Pass back as ?since= to fetch only newer messages
+        headers = {"X-Next-Cursor": messages[-1]["timestamp"]} if messages else None
+        return EncodedJSONResponse(messages, headers=headers)
 
     @app.get("/api/context")
     async def api_context(squad_id: str = "default"):
-        return orchestrator.get_context(squad_id)
+        return EncodedJSONResponse(orchestrator.get_context(squad_id))
 
     @app.post("/api/propose")
-    async def api_propose(data: dict, squad_id: str = "default"):
+    async def api_propose(request: Request, squad_id: str = "default"):
+        data = await json_body(request, "proposer_name", "content")
         return orchestrator.propose_commit(
             proposer_name=data["proposer_name"],
             content=data["content"],
@@ -1071,7 +1395,8 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
         )
 
     @app.post("/api/vote")
-    async def api_vote(data: dict, squad_id: str = "default"):
+    async def api_vote(request: Request, squad_id: str = "default"):
+        data = await json_body(request, "voter_name", "commit_id", "choice")
         return orchestrator.vote(
             voter_name=data["voter_name"],
             commit_id=data["commit_id"],
@@ -1082,11 +1407,11 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
 
     @app.get("/api/pending")
     async def api_pending(squad_id: str = "default"):
-        return orchestrator.get_pending_commits(squad_id)
+        return EncodedJSONResponse(orchestrator.get_pending_commits(squad_id))
 
     @app.get("/api/status")
     async def api_status(squad_id: str = "default"):
-        return orchestrator.get_status(squad_id)
+        return EncodedJSONResponse(orchestrator.get_status(squad_id))
 
     # ══════════════════════════════════════════════════════════════════════
     # ADMIN ENDPOINTS
@@ -1162,17 +1487,55 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
     # FILE ENDPOINTS
     # ══════════════════════════════════════════════════════════════════════
 
+    # A file version never changes, so its number and checksum make its ETag.
+    # Downloads of an explicit version may be cached outright; downloads of
+    # the latest version must revalidate, since a new upload changes the answer.
+    def version_etag(file_version: int, checksum: str) -> str:
+        return f'"v{file_version}-{checksum}"'
+
+    def version_cache_headers(file_version: int, checksum: str, requested: Optional[int]) -> dict:
+        cache_control = "private, max-age=31536000, immutable" if requested else "private, no-cache"
+        return {"ETag": version_etag(file_version, checksum), "Cache-Control": cache_control}
+
+    # The JSON read also reports current_version, which any later upload
+    # changes, so it always revalidates and its ETag names the current version
+    def read_etag(file_version: int, checksum: str, current_version: int) -> str:
+        return f'"v{file_version}-{checksum}-of{current_version}"'
+
+    def read_cache_headers(file_version: int, checksum: str, current_version: int) -> dict:
+        return {"ETag": read_etag(file_version, checksum, current_version), "Cache-Control": "private, no-cache"}
+
+    def etag_matches(request: Request, etag: str) -> bool:
+        """True if the request's If-None-Match names this ETag."""
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+        return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
     @app.get("/api/files")
     async def list_files(squad_id: str = "default", path: Optional[str] = None, sort_by: str = "date"):
         """List all shared files in the squad."""
         return orchestrator.list_files(squad_id, path=path, sort_by=sort_by)
 
     @app.get("/api/files/{filename}")
-    async def read_file(filename: str, squad_id: str = "default", path: str = "", version: Optional[int] = None):
+    async def read_file(request: Request, response: Response, filename: str, squad_id: str = "default",
+                        path: str = "", version: Optional[int] = None):
         """Read a shared file's content."""
-        result = orchestrator.read_file(squad_id, filename, path, version)
+        # One metadata lookup serves both the ETag and the read
+        located = orchestrator.locate_file_version(squad_id, filename, path, version)
+        if isinstance(located, dict):
+            raise HTTPException(status_code=404, detail=located.get("error"))
+        file, file_version = located
+        cache_headers = read_cache_headers(file_version.version, file_version.checksum, file.current_version)
+        if etag_matches(request, cache_headers["ETag"]):
+            # Revalidation: answered from the version's checksum without reading storage
+            return Response(status_code=304, headers=cache_headers)
+        result = await orchestrator.read_file_offloaded(squad_id, filename, path, version, located=located)
         if not result.get("success"):
             raise HTTPException(status_code=404, detail=result.get("error"))
+        response.headers.update(cache_headers)
         return result
 
     @app.get("/api/files/{filename}/info")
@@ -1224,11 +1587,9 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
         return result
 
     @app.get("/api/files/{filename}/download")
-    async def download_file(filename: str, squad_id: str = "default", path: str = "",
+    async def download_file(request: Request, filename: str, squad_id: str = "default", path: str = "",
                            version: Optional[int] = None):
         """Download a file with proper Content-Type (for direct browser display/download)."""
-        from fastapi.responses import Response
-
         # Get file metadata
         file = db.get_file(squad_id, filename, path)
         if not file:
@@ -1239,25 +1600,52 @@ def create_web_server(orchestrator: Orchestrator, db: SquadDatabase,
         if not file_version:
             raise HTTPException(status_code=404, detail="Version not found")
 
-        # Read content
-        from file_storage import FileStorage
-        storage = FileStorage()
-        content = storage.read_file(file_version.storage_key)
-        if content is None:
+        cache_headers = version_cache_headers(file_version.version, file_version.checksum, version)
+        if etag_matches(request, cache_headers["ETag"]):
+            return Response(status_code=304, headers=cache_headers)
+
+        # Stream from disk rather than loading the whole file; FileResponse
+        # sends it in chunks with Content-Length and Range support
+        file_path = orchestrator.file_storage.get_file_path(file_version.storage_key)
+        if file_path is None:
             raise HTTPException(status_code=404, detail="File content not found")
 
-        return Response(
-            content=content,
+        return FileResponse(
+            file_path,
             media_type=file.mime_type,
-            headers={
-                "Content-Disposition": f'inline; filename="{filename}"',
-                "Content-Length": str(len(content))
-            }
+            headers={"Content-Disposition": f'inline; filename="{filename}"', **cache_headers}
         )
 
     return app, host, port
 
 
+def mount_mcp_sse(app, mcp_server):
+    """
+    Serve the MCP server over SSE from the web app, so REST, WebSocket and
+    MCP share one uvicorn process: clients connect to GET /mcp/sse and post
+    to /mcp/messages/.
+    """
+    from mcp.server.sse import SseServerTransport
+
+    sse = SseServerTransport("/mcp/messages/")
+
+    class SseEndpoint:
+        """
+        Raw ASGI app for the event stream. connect_sse() sends the response
+        itself, so the route passes it send directly instead of wrapping it
+        in a Request and returning a Response of its own.
+        """
+
+        async def __call__(self, scope, receive, send):
+            async with sse.connect_sse(scope, receive, send) as (read_stream, write_stream):
+                await mcp_server.run(read_stream, write_stream, mcp_server.create_initialization_options())
+
+    # A callable instance rather than a function, so the route hands it
+    # (scope, receive, send) as is
+    app.add_route("/mcp/sse", SseEndpoint(), methods=["GET"])
+    app.mount("/mcp/messages/", app=sse.handle_post_message)
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # MAIN — Entry point
 # ═══════════════════════════════════════════════════════════════════════════
@@ -1284,15 +1672,22 @@ def main():
         print("Starting Squad Bot MCP server (stdio)...", file=sys.stderr)
 
         async def run_mcp():
-            async with stdio_server() as (read_stream, write_stream):
-                await server.run(read_stream, write_stream, server.create_initialization_options())
+            orch.start()
+            try:
+                async with stdio_server() as (read_stream, write_stream):
+                    await server.run(read_stream, write_stream, server.create_initialization_options())
+            finally:
+                orch.stop()
 
-        asyncio.run(run_mcp())
+        run_async(run_mcp())
 
     else:
         # Run REST API + WebSocket server
         import uvicorn
         app, host, port = create_web_server(orch, db, webhook_manager, args.host, args.port)
+        if args.mcp_sse:
+            # Tool calls stay on the event loop, alongside the REST handlers
+            mount_mcp_sse(app, create_mcp_server(orch, offload=False))
 
         # Check if Google OAuth is configured
         google_oauth_configured = bool(os.environ.get("GOOGLE_CLIENT_ID") and os.environ.get("GOOGLE_CLIENT_SECRET"))
@@ -1301,20 +1696,29 @@ def main():
         print(f"  Web UI:    http://localhost:{args.port}")
         print(f"  WebSocket: ws://localhost:{args.port}/ws")
         print(f"  REST API:  http://localhost:{args.port}/api/")
+        if args.mcp_sse:
+            print(f"  MCP (SSE): http://localhost:{args.port}/mcp/sse")
         print(f"  Auth:      {'ENABLED' if AUTH_REQUIRED else 'DISABLED (grace period)'}")
         print(f"  OAuth:     {'GOOGLE' if google_oauth_configured else 'NOT CONFIGURED'}")
+        print(f"  Loop:      {event_loop_name()}")
 
         # Start webhook delivery loop
         async def run_with_webhooks():
             webhook_manager.start()
-            config = uvicorn.Config(app, host=host, port=port)
+            orch.start()
+            # Large events are compressed once per broadcast by broadcast_event();
+            # per-message deflate would redo that work for every client.
+            # The loop is already uvloop (or rloop) via run_async(), and uvicorn's default
+            # http="auto" picks httptools when it is installed.
+            config = uvicorn.Config(app, host=host, port=port, ws_per_message_deflate=False)
             server = uvicorn.Server(config)
             try:
                 await server.serve()
             finally:
-                webhook_manager.stop()
+                orch.stop()
+                await webhook_manager.stop()
 
-        asyncio.run(run_with_webhooks())
+        run_async(run_with_webhooks())
 
 
 if __name__ == "__main__":
@@ -5,15 +5,29 @@ Handles webhook delivery with HMAC signing, retries, and exponential backoff.
 
 import asyncio
 import hashlib
+import heapq
 import hmac
+import itertools
 import json
 import logging
+import platform
+import secrets
+import ssl
+import time
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Union
 import aiohttp
 
+# orjson is optional; it serializes payloads straight to bytes, several times
+# faster than the stdlib encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from database import SquadDatabase
-from models import Webhook, WebhookDelivery
+from models import Webhook, WebhookDelivery, utc_now_iso
 
 logger = logging.getLogger(__name__)
 
@@ -27,10 +41,40 @@ MAX_FAILURES = 10
 
 # Retry delays (exponential backoff)
 RETRY_DELAYS = [5, 30, 120, 600]  # 5s, 30s, 2min, 10min
+# Seconds after creation that attempt n+1 is due: RETRY_CUMULATIVE[n-1]
+RETRY_CUMULATIVE = list(itertools.accumulate(RETRY_DELAYS))
 
 # Webhook timeout
 WEBHOOK_TIMEOUT = 10  # seconds
 
+# Most of an endpoint's response body read back; only a prefix is stored
+WEBHOOK_RESPONSE_MAX_BYTES = 512
+
+# Connection pool for deliveries; keep-alive lets repeat deliveries to the
+# same endpoint skip the TCP/TLS handshake
+WEBHOOK_MAX_CONNECTIONS = 200
+WEBHOOK_MAX_CONNECTIONS_PER_HOST = 32
+WEBHOOK_KEEPALIVE_TIMEOUT = 60  # seconds
+WEBHOOK_DNS_CACHE_TTL = 300  # seconds
+
+# Deliveries in flight at once, so one slow endpoint can't hold up the batch
+WEBHOOK_CONCURRENCY = 32
+
+# Most due deliveries sent per batch
+WEBHOOK_BATCH_SIZE = 50
+
+# Events waiting for the delivery loop to record them; when full, trigger()
+# records the event itself instead
+WEBHOOK_INBOX_SIZE = 10_000
+
+# How often the database is checked for pending deliveries this process
+# didn't queue itself (e.g. written by the MCP stdio server, or left from a
+# previous run)
+WEBHOOK_SWEEP_INTERVAL = 10  # seconds
+
+# OpenSSL release that added the SHA-NI / ARMv8 SHA-256 code paths
+SHA_ACCEL_MIN_OPENSSL = (1, 0, 2)
+
 # Supported event types
 EVENT_TYPES = [
     "new_message",
@@ -42,6 +86,39 @@ EVENT_TYPES = [
     "vote_cast",
 ]
 
+# One bit per event type; a subscription is the OR of its events' bits
+EVENT_BIT = {event: 1 << i for i, event in enumerate(EVENT_TYPES)}
+WILDCARD_MASK = (1 << len(EVENT_TYPES)) - 1  # "*"
+
+
+def _check_sha_acceleration():
+    """
+    Warn if signing will run on OpenSSL's portable SHA-256 code rather than
+    the CPU's SHA instructions (SHA-NI on x86-64, the Crypto Extensions on
+    aarch64). hashlib and hmac pick the fast path automatically when both
+    the OpenSSL build and the CPU support it; OpenSSL built with no-asm
+    never does.
+    """
+    if ssl.OPENSSL_VERSION_INFO[:3] < SHA_ACCEL_MIN_OPENSSL:
+        logger.warning(f"{ssl.OPENSSL_VERSION} predates hardware SHA-256; webhook signing will be slower")
+        return
+
+    cpu_flag = {"x86_64": "sha_ni", "amd64": "sha_ni", "aarch64": "sha2", "arm64": "sha2"}.get(
+        platform.machine().lower()
+    )
+    if cpu_flag is None:
+        return
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpuinfo = f.read()
+    except OSError:
+        return  # Not Linux; nothing to probe
+    for line in cpuinfo.splitlines():
+        if line.startswith(("flags", "Features")):
+            if cpu_flag not in line.split():
+                logger.warning(f"CPU lacks the {cpu_flag} extension; webhook signing uses software SHA-256")
+            return
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # WEBHOOK MANAGER
@@ -50,41 +127,167 @@ EVENT_TYPES = [
 class WebhookManager:
     """Manages webhook registration, signing, and delivery."""
 
+    # Headers every delivery sends unchanged
+    _BASE_HEADERS = {
+        "Content-Type": "application/json",
+        "User-Agent": "SquadBot-Webhook/1.0",
+    }
+
     def __init__(self, db: SquadDatabase):
         self.db = db
         self._running = False
         self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # set by start()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._slots = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+        # Deliveries ordered by when their next attempt is due:
+        # (monotonic due time, tiebreak, delivery id)
+        self._queue: List[tuple] = []
+        self._queue_order = itertools.count()
+        self._scheduled: set[str] = set()  # ids queued or in flight
+        # Deliveries created here and not yet sent; anything else queued is
+        # loaded from the database when it comes due
+        self._loaded: Dict[str, WebhookDelivery] = {}
+        # Creation time of each scheduled delivery on the monotonic clock, so
+        # retries are timed without parsing created_at again
+        self._created_monotonic: Dict[str, float] = {}
+        self._wake = asyncio.Event()
+        # Triggered events not yet written as deliveries:
+        # (squad_id, event_type, data, timestamp)
+        self._inbox: asyncio.Queue = asyncio.Queue(maxsize=WEBHOOK_INBOX_SIZE)
 
     def start(self):
         """Start the background delivery loop."""
         if not self._running:
             self._running = True
+            self._loop = asyncio.get_running_loop()
+            _check_sha_acceleration()
             self._task = asyncio.create_task(self._delivery_loop())
             logger.info("Webhook delivery loop started")
 
-    def stop(self):
-        """Stop the background delivery loop."""
+    async def stop(self):
+        """Stop the background delivery loop and close pooled connections."""
         self._running = False
         if self._task:
             self._task.cancel()
             self._task = None
+        # Record anything still in the inbox so the next run's sweep sends it
+        self._drain_inbox()
+        if self._session:
+            await self._session.close()
+            self._session = None
         logger.info("Webhook delivery loop stopped")
 
-    async def _delivery_loop(self):
-        """Background loop that processes pending deliveries."""
-        while self._running:
+    def _get_session(self) -> aiohttp.ClientSession:
+        """The HTTP session shared by all deliveries, created on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=WEBHOOK_MAX_CONNECTIONS,
+                limit_per_host=WEBHOOK_MAX_CONNECTIONS_PER_HOST,
+                keepalive_timeout=WEBHOOK_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=WEBHOOK_DNS_CACHE_TTL,
+                force_close=False,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT),
+            )
+        return self._session
+
+    def _schedule(self, delivery_id: str, attempt_count: int, created_at: str):
+        """Queue a delivery for its next attempt, after its retry backoff."""
+        now = time.monotonic()
+        created = self._created_monotonic.get(delivery_id)
+        if created is None:
+            created = now
+            if attempt_count:
+                # Loaded from the database: convert created_at once
+                created -= (datetime.now(timezone.utc) - datetime.fromisoformat(created_at)).total_seconds()
+            self._created_monotonic[delivery_id] = created
+        due = now
+        if 0 < attempt_count < len(RETRY_DELAYS):
+            due = max(now, created + RETRY_CUMULATIVE[attempt_count - 1])
+        heapq.heappush(self._queue, (due, next(self._queue_order), delivery_id))
+        self._scheduled.add(delivery_id)
+        self._wake.set()
+
+    def _unschedule(self, delivery_id: str):
+        """Forget a delivery that is done, or left pending for a later sweep."""
+        self._scheduled.discard(delivery_id)
+        self._created_monotonic.pop(delivery_id, None)
+        self._loaded.pop(delivery_id, None)
+
+    def _drain_inbox(self):
+        """Write delivery records for every event waiting in the inbox."""
+        while not self._inbox.empty():
+            squad_id, event_type, data, timestamp = self._inbox.get_nowait()
             try:
-                # Get pending deliveries
-                deliveries = self.db.get_pending_deliveries(limit=50)
-
-                for delivery in deliveries:
-                    if not self._running:
-                        break
+                self._create_deliveries(squad_id, event_type, data, timestamp)
+            except Exception as e:
+                logger.error(f"Error recording webhook event {event_type} for squad {squad_id}: {e}")
 
-                    await self._process_delivery(delivery)
+    def _sweep(self):
+        """
+        Queue pending deliveries from the database that aren't queued yet.
+        Only ids and retry state are read; payloads load when a delivery is due.
+        """
+        for delivery_id, attempt_count, created_at in self.db.get_pending_delivery_schedule():
+            if delivery_id not in self._scheduled:
+                self._schedule(delivery_id, attempt_count, created_at)
+
+    def _pop_due(self, now: float) -> List[WebhookDelivery]:
+        """Take up to a batch of due deliveries off the queue, loading any not in memory."""
+        batch = []
+        while self._queue and self._queue[0][0] <= now and len(batch) < WEBHOOK_BATCH_SIZE:
+            delivery_id = heapq.heappop(self._queue)[2]
+            delivery = self._loaded.pop(delivery_id, None) or self.db.get_webhook_delivery(delivery_id)
+            if delivery is None or delivery.status != "pending":
+                # Deleted, or finished by another process since it was queued
+                self._unschedule(delivery_id)
+                continue
+            batch.append(delivery)
+        return batch
 
-                # Wait before next check
-                await asyncio.sleep(1)
+    async def _delivery_loop(self):
+        """
+        Background loop that sends deliveries as they come due. It sleeps until
+        the earliest retry is due, a new delivery is triggered, or the next
+        database sweep, rather than polling every pending row each second.
+        """
+        next_sweep = 0.0
+        while self._running:
+            try:
+                self._drain_inbox()
+
+                now = time.monotonic()
+                if now >= next_sweep:
+                    self._sweep()
+                    next_sweep = now + WEBHOOK_SWEEP_INTERVAL
+
+                batch = self._pop_due(now)
+                if batch:
+                    # Deliveries to the same webhook start back to back, so
+                    # they pick up each other's idle pooled connections
+                    batch.sort(key=lambda d: d.webhook_id)
+                    # Every delivery of one event shares its payload, so
+                    # webhooks with the same secret are signed once per batch
+                    signatures: Dict[tuple, tuple] = {}
+                    # Send the batch concurrently; it finishes before the next one starts
+                    results = await asyncio.gather(
+                        *(self._process_delivery_limited(d, signatures) for d in batch),
+                        return_exceptions=True
+                    )
+                    for delivery, result in zip(batch, results):
+                        if isinstance(result, Exception):
+                            logger.error(f"Error processing webhook delivery {delivery.id}: {result}")
+                    continue
+
+                wake_at = min(self._queue[0][0], next_sweep) if self._queue else next_sweep
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, wake_at - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
 
             except asyncio.CancelledError:
                 break
@@ -92,73 +295,95 @@ class WebhookManager:
                 logger.error(f"Error in webhook delivery loop: {e}")
                 await asyncio.sleep(5)
 
-    async def _process_delivery(self, delivery: WebhookDelivery):
-        """Process a single webhook delivery."""
+    async def _process_delivery_limited(self, delivery: WebhookDelivery, signatures: Dict[tuple, tuple]):
+        """Process a delivery once one of the concurrency slots is free, then requeue it if it failed."""
+        retry = False
+        try:
+            async with self._slots:
+                if self._running:
+                    retry = await self._process_delivery(delivery, signatures)
+        finally:
+            if retry:
+                # Only the id waits out the backoff; the row is reloaded when due
+                self._schedule(delivery.id, delivery.attempt_count, delivery.created_at)
+            else:
+                self._unschedule(delivery.id)
+
+    async def _process_delivery(self, delivery: WebhookDelivery,
+                                signatures: Optional[Dict[tuple, tuple]] = None) -> bool:
+        """Process a single webhook delivery. Returns True if it should be retried."""
         webhook = self.db.get_webhook(delivery.webhook_id)
         if not webhook or not webhook.is_active:
             # Webhook deleted or disabled, mark as failed
             self.db.update_webhook_delivery(delivery.id, "failed")
-            return
+            return False
 
         # Check retry count
         if delivery.attempt_count >= len(RETRY_DELAYS):
             # Max retries exceeded
             self.db.update_webhook_delivery(delivery.id, "failed")
             self.db.update_webhook_failure(webhook.id, increment=True)
-            return
+            return False
 
-        # Calculate backoff
-        if delivery.attempt_count > 0:
-            delay = RETRY_DELAYS[min(delivery.attempt_count - 1, len(RETRY_DELAYS) - 1)]
-            # Check if enough time has passed
-            created = datetime.fromisoformat(delivery.created_at)
-            elapsed = (datetime.now(timezone.utc) - created).total_seconds()
-            total_delay = sum(RETRY_DELAYS[:delivery.attempt_count])
-            if elapsed < total_delay:
-                return  # Not ready for retry yet
-
-        # Attempt delivery
+        # Attempt delivery (the queue already waited out any backoff)
         success, status_code, response_body = await self._send_webhook(
-            webhook, delivery.event_type, delivery.payload
+            webhook, delivery.event_type, delivery.payload, delivery.id, signatures
         )
 
         if success:
             self.db.update_webhook_delivery(delivery.id, "success", status_code, response_body)
             self.db.update_webhook_failure(webhook.id, increment=False)  # Reset failure count
-        else:
-            self.db.update_webhook_delivery(delivery.id, "pending", status_code, response_body)
+            return False
 
-    async def _send_webhook(self, webhook: Webhook, event_type: str, payload: str) -> tuple[bool, Optional[int], Optional[str]]:
-        """Send a webhook request. Returns (success, status_code, response_body)."""
-        try:
-            # Parse payload
-            data = json.loads(payload)
+        self.db.update_webhook_delivery(delivery.id, "pending", status_code, response_body)
+        delivery.attempt_count += 1
+        return True
 
-            # Generate signature
-            signature = self._sign_payload(payload, webhook.secret_hash)
+    async def _send_webhook(self, webhook: Webhook, event_type: str, payload: Union[str, bytes],
+                            delivery_id: str, signatures: Optional[Dict[tuple, tuple]] = None
+                            ) -> tuple[bool, Optional[int], Optional[str]]:
+        """
+        Send a webhook request with an already-serialized JSON payload.
+        signatures, if given, maps (payload, secret_hash) to the encoded
+        payload and its signature for the deliveries sent alongside this one.
+        Returns (success, status_code, response_body).
+        """
+        try:
+            # Encode once; the same bytes are signed and sent
+            key = (payload, webhook.secret_hash)
+            signed = signatures.get(key) if signatures is not None else None
+            if signed is None:
+                payload_bytes = payload if isinstance(payload, bytes) else payload.encode()
+                signed = (payload_bytes, self._sign_payload(payload_bytes, webhook.secret_hash))
+                if signatures is not None:
+                    signatures[key] = signed
+            payload_bytes, signature = signed
 
             # Build headers
             headers = {
-                "Content-Type": "application/json",
+                **self._BASE_HEADERS,
                 "X-Squad-Signature": f"sha256={signature}",
                 "X-Squad-Event": event_type,
-                "X-Squad-Delivery-ID": data.get("delivery_id", "unknown"),
-                "User-Agent": "SquadBot-Webhook/1.0",
+                "X-Squad-Delivery-ID": delivery_id,
             }
 
-            timeout = aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT)
-
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(webhook.url, json=data, headers=headers) as response:
-                    status = response.status
-                    body = await response.text()
+            async with self._get_session().post(webhook.url, data=payload_bytes, headers=headers) as response:
+                status = response.status
+                # Read only what gets stored, however large the response is
+                raw = b""
+                while len(raw) < WEBHOOK_RESPONSE_MAX_BYTES:
+                    chunk = await response.content.read(WEBHOOK_RESPONSE_MAX_BYTES - len(raw))
+                    if not chunk:
+                        break
+                    raw += chunk
+                body = raw.decode("utf-8", errors="replace")
 
-                    # 2xx is success
-                    if 200 <= status < 300:
-                        return True, status, body[:500]  # Truncate response
-                    else:
-                        logger.warning(f"Webhook {webhook.id} returned {status}: {body[:200]}")
-                        return False, status, body[:500]
+                # 2xx is success
+                if 200 <= status < 300:
+                    return True, status, body[:500]  # Truncate response
+                else:
+                    logger.warning(f"Webhook {webhook.id} returned {status}: {body[:200]}")
+                    return False, status, body[:500]
 
         except asyncio.TimeoutError:
             logger.warning(f"Webhook {webhook.id} timed out")
@@ -170,47 +395,77 @@ class WebhookManager:
             logger.error(f"Webhook {webhook.id} unexpected error: {e}")
             return False, None, str(e)[:500]
 
-    def _sign_payload(self, payload: str, secret_hash: str) -> str:
-        """Generate HMAC-SHA256 signature for payload."""
-        # Use the secret_hash as the key (in production, you'd store and use the raw secret)
-        # For security, we use a derived key from the hash
-        key = secret_hash.encode()
-        signature = hmac.new(key, payload.encode(), hashlib.sha256).hexdigest()
-        return signature
+    def _sign_payload(self, payload: bytes, secret_hash: str) -> str:
+        """Generate HMAC-SHA256 signature for the encoded payload."""
+        return sign_payload(payload, secret_hash)
 
     def trigger(self, squad_id: str, event_type: str, data: Dict[str, Any]):
         """
         Queue a webhook delivery for all matching webhooks in a squad.
-        Called synchronously from the orchestrator.
+        Called synchronously from the orchestrator; while the delivery loop is
+        running the event is only put on its inbox, and the webhook lookup and
+        delivery inserts happen there.
         """
-        if event_type not in EVENT_TYPES:
+        if event_type not in EVENT_BIT:
             return
 
+        timestamp = utc_now_iso()
+        event = (squad_id, event_type, data, timestamp)
+        if self._running:
+            try:
+                on_loop = asyncio.get_running_loop() is self._loop
+            except RuntimeError:
+                on_loop = False
+            if on_loop:
+                self._enqueue(event)
+            else:
+                # Fired on the orchestrator's worker thread; the inbox and its
+                # wake-up event belong to the loop
+                self._loop.call_soon_threadsafe(self._enqueue, event)
+            return
+
+        self._create_deliveries(squad_id, event_type, data, timestamp)
+
+    def _enqueue(self, event: tuple):
+        """Put a triggered event on the inbox and wake the delivery loop."""
+        try:
+            self._inbox.put_nowait(event)
+            self._wake.set()
+        except asyncio.QueueFull:
+            # Loop is backed up: record the event here rather than drop it
+            self._create_deliveries(*event)
+
+    def _create_deliveries(self, squad_id: str, event_type: str, data: Dict[str, Any],
+                           timestamp: str):
+        """Write a delivery record for each webhook subscribed to the event."""
         # Get active webhooks for this squad
         webhooks = self.db.get_webhooks(squad_id, active_only=True)
+        if not webhooks:
+            return
 
-        for webhook in webhooks:
-            # Check if webhook is subscribed to this event type
-            subscribed_events = json.loads(webhook.event_types)
-            if "*" not in subscribed_events and event_type not in subscribed_events:
-                continue
-
-            # Build payload
-            payload = {
-                "event": event_type,
-                "squad_id": squad_id,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "data": data,
-            }
+        # Every subscriber gets the same payload
+        bit = EVENT_BIT[event_type]
+        subscriber_ids = [
+            webhook.id for webhook in webhooks
+            if subscribed_event_mask(webhook.event_types) & bit
+        ]
+        if not subscriber_ids:
+            return
 
-            # Create delivery record
-            delivery = self.db.create_webhook_delivery(
-                webhook.id, event_type, payload
-            )
-            payload["delivery_id"] = delivery.id
+        payload = {
+            "event": event_type,
+            "squad_id": squad_id,
+            "timestamp": timestamp,
+            "data": data,
+        }
 
-            # Update the delivery with the delivery ID in payload
-            self.db.update_webhook_delivery(delivery.id, "pending")
+        # One delivery record per subscriber, inserted together; each id goes
+        # out in X-Squad-Delivery-ID
+        payload_json = encode_payload(payload).decode()
+        for delivery in self.db.create_webhook_deliveries(subscriber_ids, event_type, payload_json):
+            if self._running:
+                self._loaded[delivery.id] = delivery
+                self._schedule(delivery.id, delivery.attempt_count, delivery.created_at)
 
     async def test_webhook(self, webhook_id: str) -> Dict[str, Any]:
         """
@@ -222,6 +477,7 @@ class WebhookManager:
             return {"success": False, "error": "Webhook not found"}
 
         # Build test payload
+        delivery_id = f"test-{datetime.now(timezone.utc).timestamp()}"
         payload = {
             "event": "test",
             "squad_id": webhook.squad_id,
@@ -230,12 +486,11 @@ class WebhookManager:
                 "message": "This is a test webhook delivery from Squad Bot",
                 "webhook_id": webhook_id,
             },
-            "delivery_id": f"test-{datetime.now(timezone.utc).timestamp()}",
+            "delivery_id": delivery_id,
         }
 
-        payload_str = json.dumps(payload)
         success, status_code, response_body = await self._send_webhook(
-            webhook, "test", payload_str
+            webhook, "test", encode_payload(payload), delivery_id
         )
 
         return {
@@ -249,13 +504,41 @@ class WebhookManager:
 # UTILITY FUNCTIONS
 # ══════════════════════════════════════════════════════════════════════════════
 
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """Serialize a webhook payload to UTF-8 JSON bytes."""
+    if orjson is not None:
+        # Integer keys are allowed by json.dumps, so allow them here too
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload).encode()
+
+
+def sign_payload(payload: bytes, secret_hash: str) -> str:
+    """Generate HMAC-SHA256 signature for the encoded payload."""
+    # Use the secret_hash as the key (in production, you'd store and use the raw secret)
+    # For security, we use a derived key from the hash
+    # One-shot C HMAC: no HMAC object or inner/outer hash state in Python
+    return hmac.digest(secret_hash.encode(), payload, "sha256").hex()
+
+
+@lru_cache(maxsize=4096)
+def subscribed_event_mask(event_types_json: str) -> int:
+    """
+    Compile a webhook's stored event_types JSON into an EVENT_BIT mask, with
+    "*" matching every event. Cached on the JSON string itself, so an
+    updated subscription is simply a new key.
+    """
+    mask = 0
+    for event in json.loads(event_types_json):
+        mask |= WILDCARD_MASK if event == "*" else EVENT_BIT.get(event, 0)
+    return mask
+
+
 def generate_webhook_secret() -> str:
     """Generate a secure webhook secret."""
-    import secrets
     return secrets.token_urlsafe(32)
 
 
-def verify_webhook_signature(payload: str, signature: str, secret: str) -> bool:
+def verify_webhook_signature(payload: Union[str, bytes], signature: str, secret: str) -> bool:
     """
     Verify a webhook signature (for incoming webhooks to Squad Bot).
     Used if Squad Bot ever needs to receive webhooks.
@@ -263,8 +546,15 @@ def verify_webhook_signature(payload: str, signature: str, secret: str) -> bool:
     if not signature.startswith("sha256="):
         return False
 
-    expected_sig = signature[7:]  # Remove "sha256=" prefix
+    try:
+        expected_sig = bytes.fromhex(signature[7:])  # Remove "sha256=" prefix
+    except ValueError:
+        return False
+    # The key is the hex SHA-256 of the secret, the same secret_hash that
+    # _sign_payload() signs with
     key = hashlib.sha256(secret.encode()).hexdigest().encode()
-    computed_sig = hmac.new(key, payload.encode(), hashlib.sha256).hexdigest()
+    if isinstance(payload, str):
+        payload = payload.encode()
+    computed_sig = hmac.digest(key, payload, "sha256")
 
     return hmac.compare_digest(computed_sig, expected_sig)